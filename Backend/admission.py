@@ -0,0 +1,286 @@
+# Backend/admission.py
+# Admission control for expensive endpoints: per-user token buckets and a
+# bounded wait queue in front of each stage's concurrency limit.
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+# stage: (concurrent calls, queue length, requests per user per minute, burst)
+STAGE_DEFAULTS = {
+    "ocr": (2, 16, 10, 5),
+    "llm": (4, 32, 30, 10),
+    "translation": (4, 32, 60, 20),
+}
+PER_USER_QUEUE = int(os.getenv("ADMISSION_PER_USER_QUEUE", "4"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # seconds
+MAX_BUCKETS = 10000
+
+
+def stage_config(stage: str) -> Dict:
+    concurrency, queue, rate, burst = STAGE_DEFAULTS[stage]
+    prefix = f"ADMISSION_{stage.upper()}_"
+    return {
+        "concurrency": int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+        "queue": int(os.getenv(prefix + "QUEUE", queue)),
+        "rate_per_minute": float(os.getenv(prefix + "RATE", rate)),
+        "burst": float(os.getenv(prefix + "BURST", burst)),
+    }
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait(self) -> float:
+        """0 if a token is available, otherwise seconds until one is"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def take(self, cost: float = 1) -> float:
+        """
+        0 if tokens were taken, otherwise seconds until one is available.
+        A cost above the balance is still granted and leaves the bucket in
+        debt, which later requests wait out.
+        """
+        wait = self.wait()
+        if not wait:
+            self.tokens -= cost
+        return wait
+
+    def refund(self, cost: float = 1):
+        """Give back tokens taken for a request that was not served"""
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    def full(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.capacity
+
+
+class Ticket:
+    """A held stage slot; release() is idempotent and safe from any thread"""
+    __slots__ = ("stage", "user_id", "loop", "started", "released")
+
+    def __init__(self, stage: "Stage", user_id: int, loop: asyncio.AbstractEventLoop):
+        self.stage = stage
+        self.user_id = user_id
+        self.loop = loop
+        self.started = time.perf_counter()
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.stage.release(self)
+        else:
+            self.loop.call_soon_threadsafe(self.stage.release, self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class Stage:
+    """
+    Concurrency limit with a bounded FIFO queue; used from the event loop
+    only. Batch items wait in a separate unbounded queue and get a free
+    slot only when no interactive request is waiting.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, rate_per_minute: float, burst: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.active = 0
+        self.waiters: deque = deque()
+        self.batch_waiters: deque = deque()
+        self.queued_by_user: Dict[int, int] = {}
+        self.buckets: Dict[int, TokenBucket] = {}
+        self.service_time = 1.0  # moving average, seconds
+        self.stats = {"admitted": 0, "queued": 0, "rate_limited": 0, "queue_full": 0, "timed_out": 0,
+                      "batch_charged": 0, "batch_admitted": 0}
+
+    def retry_after(self) -> int:
+        backlog = len(self.waiters) + 1
+        return max(1, math.ceil(self.service_time * backlog / self.concurrency))
+
+    def reject(self, reason: str, retry_after: float):
+        self.stats[reason] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many {self.name} requests ({reason.replace('_', ' ')}), retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def bucket(self, user_id: int) -> TokenBucket:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                self.buckets = {user: b for user, b in self.buckets.items() if not b.full()}
+            bucket = self.buckets[user_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def take_token(self, user_id: int, cost: float = 1):
+        wait = self.bucket(user_id).take(cost)
+        if wait:
+            self.reject("rate_limited", wait)
+
+    async def acquire(self, user_id: int) -> Ticket:
+        loop = asyncio.get_running_loop()
+        immediate = self.active < self.concurrency and not self.waiters
+        # Checked before taking a token, so a request turned away unserved costs nothing
+        if not immediate and (len(self.waiters) >= self.max_queue
+                              or self.queued_by_user.get(user_id, 0) >= PER_USER_QUEUE):
+            self.reject("queue_full", self.retry_after())
+        self.take_token(user_id)
+        if immediate:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return Ticket(self, user_id, loop)
+
+        future = loop.create_future()
+        self.waiters.append(future)
+        self.queued_by_user[user_id] = self.queued_by_user.get(user_id, 0) + 1
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.waiters.remove(future)
+                self.bucket(user_id).refund()
+                self.reject("timed_out", self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away; hand the slot on if it was already granted
+            if future.done() and not future.cancelled():
+                self.release(None)
+            else:
+                future.cancel()
+                if future in self.waiters:
+                    self.waiters.remove(future)
+            raise
+        finally:
+            remaining = self.queued_by_user.get(user_id, 1) - 1
+            if remaining:
+                self.queued_by_user[user_id] = remaining
+            else:
+                self.queued_by_user.pop(user_id, None)
+        self.stats["admitted"] += 1
+        return Ticket(self, user_id, loop)
+
+    async def acquire_batch(self, user_id: int) -> Ticket:
+        """Slot for one item of a batch whose tokens were charged up front; never rejected"""
+        loop = asyncio.get_running_loop()
+        if self.active < self.concurrency and not self.waiters and not self.batch_waiters:
+            self.active += 1
+        else:
+            future = loop.create_future()
+            self.batch_waiters.append(future)
+            try:
+                await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release(None)
+                else:
+                    future.cancel()
+                    if future in self.batch_waiters:
+                        self.batch_waiters.remove(future)
+                raise
+        self.stats["batch_admitted"] += 1
+        return Ticket(self, user_id, loop)
+
+    def release(self, ticket: Optional[Ticket]):
+        if ticket is not None:
+            elapsed = time.perf_counter() - ticket.started
+            self.service_time = 0.9 * self.service_time + 0.1 * elapsed
+        # Pass the slot straight to the next waiter, keeping active unchanged;
+        # interactive requests go before batch items
+        for waiters in (self.waiters, self.batch_waiters):
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(True)
+                    return
+        self.active -= 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queue_depth": len(self.waiters),
+            "batch_queue_depth": len(self.batch_waiters),
+            "max_queue": self.max_queue,
+            "rate_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "avg_service_ms": round(self.service_time * 1000, 1),
+            **self.stats,
+        }
+
+
+class AdmissionController:
+    """
+    Gate for the OCR, LLM and translation stages. A request first needs a
+    token from the user's bucket for the stage, then a concurrency slot;
+    when all slots are busy it waits in a bounded queue (a few places per
+    user at most). A full queue or an empty bucket fails fast with 429 and
+    a Retry-After estimate.
+
+    A batch is charged one token per item when it is submitted (charge()),
+    which may leave the user's bucket in debt, and its items then share the
+    same slots through batch_slot(), behind any waiting interactive request.
+    """
+
+    def __init__(self, stages: Optional[Dict[str, Dict]] = None):
+        if stages is None:
+            stages = {name: stage_config(name) for name in STAGE_DEFAULTS}
+        self.stages = {
+            name: Stage(name, config["concurrency"], config["queue"], config["rate_per_minute"], config["burst"])
+            for name, config in stages.items()
+        }
+
+    async def acquire(self, stage: str, user_id: int) -> Ticket:
+        """Slot for the stage; use as `async with await admission.acquire(...)` or release() it"""
+        return await self.stages[stage].acquire(user_id)
+
+    def charge(self, stages: List[str], user_id: int, cost: float):
+        """Take cost tokens from each stage's bucket for the user, or reject with 429 and take none"""
+        for stage in stages:
+            wait = self.stages[stage].bucket(user_id).wait()
+            if wait:
+                self.stages[stage].reject("rate_limited", wait)
+        for stage in stages:
+            self.stages[stage].take_token(user_id, cost)
+            self.stages[stage].stats["batch_charged"] += cost
+
+    async def batch_slot(self, stage: str, user_id: int) -> Ticket:
+        """Slot for an item of a charged batch; use as `async with await admission.batch_slot(...)`"""
+        return await self.stages[stage].acquire_batch(user_id)
+
+    def snapshot(self) -> Dict:
+        return {
+            "per_user_queue": PER_USER_QUEUE,
+            "queue_timeout": QUEUE_TIMEOUT,
+            "stages": {name: stage.snapshot() for name, stage in self.stages.items()},
+        }
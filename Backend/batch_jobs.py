@@ -0,0 +1,138 @@
+# Backend/batch_jobs.py
+# Bounded-concurrency batch processing and a job store shared by workers.
+import asyncio
+import os
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# Maximum concurrent calls per pipeline stage inside a batch, for stages
+# not gated by admission control (LLM and translation share its slots)
+STAGE_LIMITS = {
+    "risk": int(os.getenv("BATCH_RISK_CONCURRENCY", "2")),
+}
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+JOB_TTL = 3600  # seconds a finished job is kept
+RUNNING_JOB_TTL = 24 * 3600  # a job whose worker died is dropped after this
+PROGRESS_INTERVAL = 1.0  # seconds between progress saves of a running job
+
+
+class StageLimiter:
+    """
+    Runs blocking stage functions in the threadpool, bounded per stage.
+    Stages the admission controller knows take its batch slots, so batches
+    and interactive requests share one concurrency limit; other stages use
+    a semaphore of their own.
+    """
+
+    def __init__(self, limits: Dict[str, int], admission=None):
+        self.limits = dict(limits)
+        self.admission = admission
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        if stage not in self._semaphores:
+            self._semaphores[stage] = asyncio.Semaphore(self.limits.get(stage, 1))
+        return self._semaphores[stage]
+
+    async def run(self, stage: str, user_id: int, func: Callable, *args):
+        if self.admission is not None and stage in self.admission.stages:
+            async with await self.admission.batch_slot(stage, user_id):
+                return await run_in_threadpool(func, *args)
+        async with self._semaphore(stage):
+            return await run_in_threadpool(func, *args)
+
+
+class BatchJobStore:
+    """
+    Keeps batch job status and results for polling clients. Jobs live in the
+    shared state, so a poll can land on any worker; the worker running a job
+    answers from memory and writes its progress at most every
+    progress_interval seconds.
+    """
+
+    def __init__(self, shared, ttl: float = JOB_TTL, progress_interval: float = PROGRESS_INTERVAL):
+        self.shared = shared
+        self.ttl = ttl
+        self.progress_interval = progress_interval
+        self._running: Dict[str, Dict] = {}
+        self._saved_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, user_id: int, total: int) -> Dict:
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "status": "pending",
+            "total": total,
+            "completed": 0,
+            "failed": 0,
+            "results": [None] * total,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        with self._lock:
+            self._running[job["job_id"]] = job
+        self.save(job)
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[Dict]:
+        with self._lock:
+            job = self._running.get(job_id)
+        if job is not None:
+            return job if job["user_id"] == user_id else None
+        return self.shared.load_job(job_id, user_id)
+
+    def save(self, job: Dict):
+        try:
+            self.shared.save_job(job, self.ttl if job["finished_at"] else RUNNING_JOB_TTL)
+        except Exception as e:
+            print(f"Error saving batch job {job['job_id']}: {e}")
+        self._saved_at[job["job_id"]] = time.monotonic()
+
+    def progress(self, job: Dict):
+        """Save a running job if its last save is older than progress_interval"""
+        if time.monotonic() - self._saved_at.get(job["job_id"], 0) >= self.progress_interval:
+            self.save(job)
+
+    def finish(self, job: Dict):
+        """Save the final state; from then on the job is served from the shared state"""
+        self.save(job)
+        with self._lock:
+            self._running.pop(job["job_id"], None)
+            self._saved_at.pop(job["job_id"], None)
+
+
+async def run_batch(job: Dict, items: List[Dict], process: Callable[[Dict], Awaitable[Dict]],
+                    on_progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Process all items concurrently and record per-item results on the job,
+    calling on_progress(job) after each item. Concurrency is bounded by the
+    StageLimiter the process function uses, so items are simply all
+    scheduled at once.
+    """
+    job["status"] = "running"
+
+    async def run_item(index: int, item: Dict):
+        try:
+            result = await process(item)
+            result["success"] = True
+            job["completed"] += 1
+        except Exception as e:
+            print(f"Error in batch item {index}: {e}")
+            result = {"success": False, "error": str(e)}
+            job["failed"] += 1
+        if "ref" in item:
+            result["ref"] = item["ref"]
+        job["results"][index] = result
+        if on_progress is not None:
+            on_progress(job)
+
+    await asyncio.gather(*(run_item(index, item) for index, item in enumerate(items)))
+    job["status"] = "completed"
+    job["finished_at"] = time.time()
+    return job
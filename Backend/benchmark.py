@@ -0,0 +1,436 @@
+# Backend/benchmark.py
+# Micro-benchmarks for the backend. Run from the Backend directory, e.g.:
+#   python benchmark.py responses --pages 200
+import argparse
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_CLAUSE = (
+    "The Tenant shall pay the monthly rent of Rs. 25,000 on or before the fifth day of each month. "
+    "If the Tenant fails to pay, a penalty of two percent per month shall be charged, provided that "
+    "the Landlord may waive the penalty at its option. The Tenant must indemnify the Landlord against "
+    "all damages arising from any breach of this Agreement. \"Premises\" means the property described "
+    "in Schedule A, hereinafter referred to as the Premises. "
+)
+
+
+def make_contract(pages: int) -> str:
+    """Synthetic contract text, roughly 3 KB per page"""
+    return SAMPLE_CLAUSE * (6 * pages)
+
+
+def best_time(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers] + rows:
+        print("  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)))
+
+
+def bench_responses(args):
+    """Bytes sent and serialization time of /simplify responses"""
+    from main import detect_risk_spans, format_risks, add_color_annotations, simplify_text_rule_based
+    from response_encoding import dumps, select_fields, parse_fields, brotli
+
+    text = make_contract(args.pages)
+    simplified = simplify_text_rule_based(text)
+    risks = detect_risk_spans(text)
+    simplified_risks = detect_risk_spans(simplified)
+    annotated_original = add_color_annotations(text, risks)
+    annotated_simplified = add_color_annotations(simplified, simplified_risks)
+
+    def payload(risk_format):
+        return {
+            "original_text": text,
+            "simplified_text": simplified,
+            "original_risks": format_risks(risks, risk_format),
+            "simplified_risks": format_risks(simplified_risks, risk_format),
+            "annotated_original": annotated_original,
+            "annotated_simplified": annotated_simplified,
+            "success": True
+        }
+
+    full = payload("full")
+    compact = payload("compact")
+    fields = parse_fields("simplified_text,simplified_risks")
+    variants = [
+        ("full, stdlib json", full, lambda p: json.dumps(p).encode("utf-8")),
+        ("full, fast encoder", full, dumps),
+        ("compact risks, fast encoder", compact, dumps),
+        ("compact risks, 2 fields", compact, lambda p: dumps(select_fields(p, fields))),
+    ]
+
+    print(f"Document: {args.pages} pages, {len(text):,} chars, {len(risks):,} risk spans")
+    rows = []
+    for name, body, encode in variants:
+        encoded = encode(body)
+        row = [name, f"{len(encoded):,}", f"{best_time(lambda: encode(body), args.repeat) * 1000:.1f}"]
+        row.append(f"{len(gzip.compress(encoded, compresslevel=5)):,}")
+        row.append(f"{len(brotli.compress(encoded, quality=4)):,}" if brotli else "n/a")
+        rows.append(row)
+    print_table(["variant", "bytes", "serialize ms", "gzip bytes", "br bytes"], rows)
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the methods LocalSeq2SeqBackend uses"""
+
+    def encode(self, text):
+        return text.split()
+
+    def convert_ids_to_tokens(self, ids):
+        return list(ids)
+
+    def convert_tokens_to_ids(self, tokens):
+        return list(tokens)
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(ids)
+
+
+class StubTranslator:
+    """Echoes its input; each call costs a fixed overhead plus a per-sentence time, like a model"""
+
+    def __init__(self, call_ms: float = 20, sentence_ms: float = 2):
+        self.call_ms = call_ms
+        self.sentence_ms = sentence_ms
+
+    def translate_batch(self, source, **options):
+        from types import SimpleNamespace
+
+        time.sleep((self.call_ms + self.sentence_ms * len(source)) / 1000)
+        return [SimpleNamespace(hypotheses=[tokens]) for tokens in source]
+
+
+def bench_batching(args):
+    """Local backend throughput (sentences/s) against the dynamic batch size"""
+    from concurrent.futures import ThreadPoolExecutor
+    from document_model import parse_document
+    from simplification_backends import LocalSeq2SeqBackend
+
+    sentences = [s for s in parse_document(make_contract(1)).sentences() if s.strip()]
+    sentences = (sentences * (args.sentences // len(sentences) + 1))[:args.sentences]
+
+    rows = []
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        if args.stub:
+            backend = LocalSeq2SeqBackend(max_batch_size=batch_size, max_wait_ms=args.max_wait_ms,
+                                          tokenizer=StubTokenizer(), translator=StubTranslator())
+        else:
+            backend = LocalSeq2SeqBackend(args.model_dir, max_batch_size=batch_size, max_wait_ms=args.max_wait_ms)
+        backend.simplify(sentences[0])  # warm-up
+        backend.batcher.stats.update(batches=0, items=0, max_batch=0)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            list(pool.map(backend.simplify, sentences))
+        elapsed = time.perf_counter() - started
+        stats = backend.batcher.stats
+        rows.append([batch_size, f"{len(sentences) / elapsed:.1f}",
+                     f"{stats['items'] / max(stats['batches'], 1):.1f}", f"{elapsed:.2f}"])
+        backend.close()
+    model = "stub (offline)" if args.stub else args.model_dir
+    print(f"{len(sentences)} sentences from {args.clients} concurrent clients, model {model}")
+    print_table(["max batch", "sentences/s", "avg batch", "seconds"], rows)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_startup(args):
+    """Cold import time of main and time from process start to first response"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, WARMUP_ON_STARTUP="0" if args.no_warmup else "1")
+    import_code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for run in range(args.runs):
+            output = subprocess.run([sys.executable, "-c", import_code], cwd=workdir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            import_seconds = float(output.strip().splitlines()[-1])
+
+            port = free_port()
+            started = time.perf_counter()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                while True:
+                    try:
+                        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                            if response.status == 200:
+                                break
+                    except OSError:
+                        if time.perf_counter() - started > 30:
+                            raise RuntimeError("server did not start within 30s")
+                        time.sleep(0.01)
+                first_response = time.perf_counter() - started
+            finally:
+                server.terminate()
+                server.wait()
+            rows.append([run + 1, f"{import_seconds * 1000:.0f}", f"{first_response * 1000:.0f}"])
+    print_table(["run", "import main ms", "first response ms"], rows)
+
+
+def bench_profiling(args):
+    """Per-request latency without the profiling middleware, with it idle, and profiling"""
+    import asyncio
+    import statistics
+    from fastapi import FastAPI
+    from profiling import ProfileStore, ProfilingMiddleware
+    from main import simplify_text_rule_based
+
+    text = make_contract(args.pages)
+
+    def build(with_middleware: bool, store_dir: str) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/simplify")
+        def simplify():
+            return {"length": len(simplify_text_rule_based(text))}
+
+        if with_middleware:
+            app.add_middleware(ProfilingMiddleware, store=ProfileStore(store_dir, keep=5),
+                               is_admin=lambda headers: True, sample_rate=0)
+        return app
+
+    async def call(app, headers):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/simplify", "raw_path": b"/simplify", "root_path": "",
+            "query_string": b"", "headers": headers, "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await app(scope, receive, send)
+
+    async def measure(app, headers):
+        for _ in range(10):
+            await call(app, headers)
+        times = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            await call(app, headers)
+            times.append(time.perf_counter() - started)
+        return statistics.median(times), sorted(times)[int(len(times) * 0.95) - 1]
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        cases = [
+            ("no middleware", build(False, store_dir), []),
+            ("middleware, not profiled", build(True, store_dir), []),
+            ("profiled", build(True, store_dir), [(b"x-profile", b"1")]),
+        ]
+        results = [(name, *asyncio.run(measure(app, headers))) for name, app, headers in cases]
+
+    baseline = results[0][1]
+    print_table(
+        ["mode", "median ms", "p95 ms", "overhead"],
+        [[name, f"{median * 1000:.3f}", f"{p95 * 1000:.3f}", f"{(median / baseline - 1) * 100:+.1f}%"]
+         for name, median, p95 in results]
+    )
+
+def make_pdf(pages: int) -> bytes:
+    import fitz
+
+    pdf = fitz.open()
+    text = make_contract(1)
+    for _ in range(pages):
+        pdf.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=7)
+    return pdf.tobytes()
+
+
+def post(url: str, body: bytes, content_type: str, token: str = None) -> dict:
+    headers = {"Content-Type": content_type}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def multipart(filename: str, content: bytes):
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n").encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def bench_workers(args):
+    """/extract-text throughput (CPU-bound PDF parsing) against the number of worker processes"""
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, WARMUP_ON_STARTUP="0",
+               ADMISSION_OCR_RATE="1000000", ADMISSION_OCR_BURST="1000000", ADMISSION_OCR_QUEUE="10000",
+               ADMISSION_PER_USER_QUEUE="10000")
+    body, content_type = multipart("contract.pdf", make_pdf(args.pages))
+    print(f"CPUs: {os.cpu_count()}, PDF: {args.pages} pages, {args.requests} requests, {args.clients} clients")
+
+    rows = []
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(",")]:
+        with tempfile.TemporaryDirectory() as workdir:
+            port = free_port()
+            server = subprocess.Popen(
+                [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--workers", str(workers),
+                 "--port", str(port), "--host", "127.0.0.1", "--log-level", "warning"],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            base = f"http://127.0.0.1:{port}"
+            try:
+                started = time.perf_counter()
+                while True:
+                    try:
+                        urllib.request.urlopen(base + "/", timeout=1).close()
+                        break
+                    except OSError:
+                        if time.perf_counter() - started > 60:
+                            raise RuntimeError("server did not start within 60s")
+                        time.sleep(0.1)
+                account = json.dumps({"name": "bench", "email": "bench@example.com", "password": "bench"})
+                token = post(base + "/signup", account.encode(), "application/json")["access_token"]
+                url = base + "/extract-text"
+
+                def extract(_):
+                    return post(url, body, content_type, token)
+
+                with ThreadPoolExecutor(args.clients) as pool:
+                    list(pool.map(extract, range(args.clients)))  # warm every worker
+                    started = time.perf_counter()
+                    list(pool.map(extract, range(args.requests)))
+                    elapsed = time.perf_counter() - started
+            finally:
+                server.terminate()
+                server.wait()
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput
+        rows.append([workers, f"{throughput:.1f}", f"{throughput / baseline:.2f}x"])
+    print_table(["workers", "requests/s", "speedup"], rows)
+
+
+def bench_writes(args):
+    """Result-write throughput against concurrency: one commit per write vs. write-behind group commits"""
+    import sqlite3
+    import main
+    from write_behind import WriteBehindQueue
+
+    text = make_contract(args.pages)
+    columns = {"simplified_text": main.simplify_text_rule_based(text)}
+    risk_sets = {"original": main.detect_risk_spans(text),
+                 "simplified": main.detect_risk_spans(columns["simplified_text"])}
+    print(f"{args.writes} writes of a {args.pages}-page result with {len(risk_sets['original'])} risk spans each")
+
+    cwd = os.getcwd()
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            main.init_db()
+            conn = sqlite3.connect("legal_app.db")
+            clients = max(int(n) for n in args.concurrency.split(","))
+            conn.executemany("INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, ?)",
+                             [(i, "bench", f"bench{i}@example.com", "-") for i in range(1, clients + 1)])
+            conn.executemany("INSERT INTO documents (id, user_id, original_text) VALUES (?, ?, ?)",
+                             [(i, i, text) for i in range(1, clients + 1)])
+            conn.commit()
+            conn.close()
+
+            def direct(user_id):
+                conn = sqlite3.connect("legal_app.db", timeout=60)
+                main.write_results(conn.cursor(), user_id, user_id, columns, risk_sets)
+                conn.commit()
+                conn.close()
+
+            for concurrency in [int(n) for n in args.concurrency.split(",")]:
+                users = [1 + i % concurrency for i in range(args.writes)]
+                with ThreadPoolExecutor(concurrency) as pool:
+                    started = time.perf_counter()
+                    list(pool.map(direct, users))
+                    direct_seconds = time.perf_counter() - started
+
+                    queue = WriteBehindQueue("legal_app.db", enabled=True)
+                    queue.start()
+                    started = time.perf_counter()
+                    list(pool.map(lambda user_id: queue.submit(user_id, main.write_results, user_id, user_id,
+                                                              columns, risk_sets), users))
+                    queue.flush()
+                    queued_seconds = time.perf_counter() - started
+                    queue.close()
+                batches = queue.stats["batches"]
+                rows.append([concurrency, f"{args.writes / direct_seconds:.0f}", f"{args.writes / queued_seconds:.0f}",
+                             batches, f"{args.writes / batches:.1f}"])
+        finally:
+            os.chdir(cwd)
+    print_table(["clients", "direct writes/s", "write-behind writes/s", "commits", "writes/commit"], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    responses = subparsers.add_parser("responses", help="response size and serialization time")
+    responses.add_argument("--pages", type=int, default=100)
+    responses.add_argument("--repeat", type=int, default=5)
+    responses.set_defaults(func=bench_responses)
+
+    batching = subparsers.add_parser("batching", help="local backend throughput against batch size")
+    model = batching.add_mutually_exclusive_group(required=True)
+    model.add_argument("--model-dir", help="CTranslate2 model directory")
+    model.add_argument("--stub", action="store_true", help="offline stub model: measures the batching alone")
+    batching.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    batching.add_argument("--sentences", type=int, default=256)
+    batching.add_argument("--clients", type=int, default=32)
+    batching.add_argument("--max-wait-ms", type=float, default=10)
+    batching.set_defaults(func=bench_batching)
+
+    startup = subparsers.add_parser("startup", help="import time and time to first response")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--no-warmup", action="store_true", help="disable background warm-up")
+    startup.set_defaults(func=bench_startup)
+
+    profiling = subparsers.add_parser("profiling", help="request profiling overhead, idle and active")
+    profiling.add_argument("--pages", type=int, default=1)
+    profiling.add_argument("--requests", type=int, default=200)
+    profiling.set_defaults(func=bench_profiling)
+
+    workers = subparsers.add_parser("workers", help="throughput against the number of worker processes")
+    workers.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    workers.add_argument("--pages", type=int, default=5)
+    workers.add_argument("--requests", type=int, default=100)
+    workers.add_argument("--clients", type=int, default=16)
+    workers.set_defaults(func=bench_workers)
+
+    writes = subparsers.add_parser("writes", help="result-write throughput with and without write-behind")
+    writes.add_argument("--concurrency", default="1,4,16,64", help="comma-separated client counts")
+    writes.add_argument("--writes", type=int, default=500)
+    writes.add_argument("--pages", type=int, default=1)
+    writes.set_defaults(func=bench_writes)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
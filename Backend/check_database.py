@@ -1,50 +1,226 @@
 # check_database.py
+# Inspect and export legal_app.db without loading it into memory. Rows are
+# streamed from the cursor and text previews are cut in SQL, e.g.:
+#   python check_database.py                      # tables, users, document previews
+#   python check_database.py documents --user 3 --since 2024-01-01
+#   python check_database.py stats
+#   python check_database.py export --format ndjson --output documents.ndjson
+import argparse
+import csv
+import json
 import sqlite3
+import sys
+from typing import List, Optional, Tuple
 
-def view_database():
-    # Connect to the database
-    conn = sqlite3.connect('legal_app.db')
-    cursor = conn.cursor()
-    
-    # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
+DB_PATH = 'legal_app.db'
+TEXT_COLUMNS = ["original_text", "simplified_text", "translated_text"]
+DOCUMENT_COLUMNS = ["id", "user_id", "created_at"] + TEXT_COLUMNS
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Read-only connection, so inspecting never takes a write lock"""
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+
+def document_filter(args, alias: str = "") -> Tuple[str, List]:
+    """WHERE clause and parameters for the --user/--email/--since/--until options"""
+    clauses = []
+    params: List = []
+    if args.user is not None:
+        clauses.append(f"{alias}user_id = ?")
+        params.append(args.user)
+    if args.email:
+        clauses.append(f"{alias}user_id = (SELECT id FROM users WHERE email = ?)")
+        params.append(args.email)
+    if args.since:
+        clauses.append(f"{alias}created_at >= ?")
+        params.append(args.since)
+    if args.until:
+        clauses.append(f"{alias}created_at < date(?, '+1 day')")
+        params.append(args.until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def limit_clause(limit: Optional[int]) -> str:
+    return f" LIMIT {int(limit)}" if limit else ""
+
+
+def print_tables(conn: sqlite3.Connection):
     print("Tables in database:")
-    for table in tables:
-        print(f" - {table[0]}")
-    
-    print("\n" + "="*50)
-    
-    # View users table
-    cursor.execute("SELECT * FROM users;")
-    users = cursor.fetchall()
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"):
+        print(f" - {name}")
+
+
+def print_users(conn: sqlite3.Connection, limit: Optional[int] = None):
     print("Users table:")
-    if users:
-        for user in users:
-            print(f"ID: {user[0]}, Name: {user[1]}, Email: {user[2]}, Created: {user[4]}")
-    else:
+    found = False
+    for user_id, name, email, created in conn.execute(
+            "SELECT id, name, email, created_at FROM users ORDER BY id" + limit_clause(limit)):
+        found = True
+        print(f"ID: {user_id}, Name: {name}, Email: {email}, Created: {created}")
+    if not found:
         print("No users found")
-    
-    print("\n" + "="*50)
-    
-    # View documents table
-    cursor.execute("SELECT * FROM documents;")
-    documents = cursor.fetchall()
+
+
+def print_documents(conn: sqlite3.Connection, args):
+    where, params = document_filter(args)
+    n = int(args.preview)
+    previews = ", ".join(f"substr({column}, 1, {n}), length({column})" for column in TEXT_COLUMNS)
     print("Documents table:")
-    if documents:
-        for doc in documents:
-            print(f"ID: {doc[0]}, User ID: {doc[1]}, Created: {doc[5]}")
-            if doc[2]:  # original_text
-                print(f"  Original text: {doc[2][:100]}...")
-            if doc[3]:  # simplified_text
-                print(f"  Simplified text: {doc[3][:100]}...")
-            if doc[4]:  # translated_text
-                print(f"  Translated text: {doc[4][:100]}...")
-            print()
-    else:
+    found = False
+    for row in conn.execute(
+            f"SELECT id, user_id, created_at, {previews} FROM documents{where} ORDER BY id" + limit_clause(args.limit),
+            params):
+        found = True
+        print(f"ID: {row[0]}, User ID: {row[1]}, Created: {row[2]}")
+        for i, label in enumerate(["Original", "Simplified", "Translated"]):
+            preview, length = row[3 + 2 * i], row[4 + 2 * i]
+            if preview:
+                more = "..." if length > n else ""
+                print(f"  {label} text ({length} chars): {preview}{more}")
+        print()
+    if not found:
         print("No documents found")
-    
+
+
+def print_stats(conn: sqlite3.Connection, args):
+    """Row counts, on-disk size per table and per-user document counts"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    print(f"Database: {page_count * page_size / 1e6:.1f} MB ({page_count} pages of {page_size} B, "
+          f"{freelist} free)")
+
+    sizes = {}
+    try:
+        for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+            sizes[name] = size
+    except sqlite3.OperationalError:
+        pass  # SQLite built without the dbstat table; sizes are omitted
+
+    print(f"\n{'table':<32} {'rows':>12} {'size MB':>10}")
+    tables = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    for name in tables:
+        try:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+        except sqlite3.OperationalError:
+            rows = "-"  # virtual table whose module is unavailable
+        size = f"{sizes[name] / 1e6:.2f}" if name in sizes else "-"
+        print(f"{name:<32} {rows:>12} {size:>10}")
+
+    where, params = document_filter(args)
+    lengths = ", ".join(f"COALESCE(SUM(length({column})), 0)" for column in TEXT_COLUMNS)
+    row = conn.execute(f"SELECT COUNT(*), MIN(created_at), MAX(created_at), {lengths} FROM documents{where}",
+                       params).fetchone()
+    print(f"\nDocuments: {row[0]} (from {row[1]} to {row[2]})")
+    for column, total in zip(TEXT_COLUMNS, row[3:]):
+        print(f"  {column}: {total / 1e6:.2f} M chars")
+
+    where, params = document_filter(args, "d.")
+    print(f"\nTop {args.top} users by documents:")
+    for user_id, email, count, chars in conn.execute(
+            "SELECT d.user_id, u.email, COUNT(*), COALESCE(SUM(length(d.original_text)), 0) "
+            f"FROM documents d LEFT JOIN users u ON u.id = d.user_id{where} "
+            "GROUP BY d.user_id ORDER BY COUNT(*) DESC LIMIT ?", params + [args.top]):
+        print(f"  {user_id:>6} {email or '?':<40} {count:>8} documents {chars / 1e6:>8.2f} M chars")
+
+
+def export_documents(conn: sqlite3.Connection, args):
+    """Write matching documents one row at a time as NDJSON or CSV"""
+    columns = args.columns.split(",") if args.columns else DOCUMENT_COLUMNS
+    unknown = [column for column in columns if column not in DOCUMENT_COLUMNS]
+    if unknown:
+        sys.exit(f"Unknown columns: {', '.join(unknown)} (choose from {', '.join(DOCUMENT_COLUMNS)})")
+    where, params = document_filter(args)
+    cursor = conn.execute(
+        f"SELECT {', '.join(columns)} FROM documents{where} ORDER BY id" + limit_clause(args.limit), params
+    )
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    count = 0
+    try:
+        if args.format == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in cursor:
+                out.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                out.write("\n")
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {count} documents", file=sys.stderr)
+
+
+def view_database(args):
+    """Default view: tables, users and document previews"""
+    conn = connect(args.db)
+    print_tables(conn)
+    print("\n" + "="*50)
+    print_users(conn, args.limit)
+    print("\n" + "="*50)
+    print_documents(conn, args)
     conn.close()
 
+
+def add_filters(parser: argparse.ArgumentParser):
+    parser.add_argument("--user", type=int, help="only documents of this user id")
+    parser.add_argument("--email", help="only documents of the user with this email")
+    parser.add_argument("--since", help="created on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="created on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, help="at most this many rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and export the legal app database")
+    parser.add_argument("--db", default=DB_PATH, help=f"database path (default {DB_PATH})")
+    parser.set_defaults(user=None, email=None, since=None, until=None, limit=None, preview=100)
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("tables", help="list tables")
+
+    users = subparsers.add_parser("users", help="list users")
+    users.add_argument("--limit", type=int)
+
+    documents = subparsers.add_parser("documents", help="document previews")
+    add_filters(documents)
+    documents.add_argument("--preview", type=int, default=100, help="characters of text to show")
+
+    stats = subparsers.add_parser("stats", help="row counts, table sizes and per-user totals")
+    add_filters(stats)
+    stats.add_argument("--top", type=int, default=10, help="users to list")
+
+    export = subparsers.add_parser("export", help="stream documents as NDJSON or CSV")
+    add_filters(export)
+    export.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export.add_argument("--columns", help=f"comma-separated subset of {','.join(DOCUMENT_COLUMNS)}")
+    export.add_argument("--output", help="file to write (default stdout)")
+
+    args = parser.parse_args()
+    if args.command is None:
+        view_database(args)
+        return
+
+    conn = connect(args.db)
+    try:
+        if args.command == "tables":
+            print_tables(conn)
+        elif args.command == "users":
+            print_users(conn, args.limit)
+        elif args.command == "documents":
+            print_documents(conn, args)
+        elif args.command == "stats":
+            print_stats(conn, args)
+        elif args.command == "export":
+            export_documents(conn, args)
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
-    view_database()
\ No newline at end of file
+    main()
@@ -0,0 +1,338 @@
+# Backend/clause_index.py
+# Near-duplicate clause index (MinHash/LSH) for reusing past simplifications.
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from document_model import parse_document
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MIN_WORDS = 6
+SIMILARITY_THRESHOLD = 0.85
+REFRESH_INTERVAL = 5  # seconds between checks for clauses added by other worker processes
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)  # fixed seed: signatures are persisted and must stay comparable
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+MONTHS = (r'(?:January|February|March|April|May|June|July|August|September|October|November|December|'
+          r'Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\.?')
+ENTITY_PATTERN = re.compile(
+    r'(?P<DATE>\b\d{1,2}(?:st|nd|rd|th)?\s+' + MONTHS + r',?\s+\d{4}\b'
+    r'|\b' + MONTHS + r'\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b'
+    r'|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b)'
+    r'|(?P<AMOUNT>(?:[$€£₹]|\b(?:Rs\.?|INR|USD|EUR|GBP)\s?)\s?\d[\d,]*(?:\.\d+)?)'
+    r'|(?P<QUOTED>"[^"\n]{1,80}"|“[^”\n]{1,80}”)'
+    r'|(?P<NAME>\b[A-Z][\w&\'.-]*(?:\s+(?:[A-Z][\w&\'.-]*|&|of))*\s+[A-Z][\w&\'.-]*)'
+    r'|(?P<NUMBER>\b\d[\d,]*(?:\.\d+)?\b)'
+)
+# Capitalised words that start sentences or name roles rather than parties
+NAME_STOPWORDS = {
+    "The", "This", "That", "These", "Those", "If", "In", "On", "Upon", "Any", "Each", "Every",
+    "Such", "All", "No", "Either", "Neither", "Notwithstanding", "Subject", "Except", "Unless",
+    "Where", "When", "Whereas", "Provided", "For", "Nothing", "Both", "An", "A",
+}
+# Words that change a clause's legal meaning; their counts must match exactly
+CRITICAL_WORDS = re.compile(
+    r"\b(?:not|no|never|nor|neither|cannot|can't|won't|shall|may|must|will|without|unless|except|only|"
+    r"prior|before|after|within|jointly|severally)\b",
+    re.IGNORECASE
+)
+NAME_LEAD = re.compile(r'(?:(?:' + "|".join(sorted(NAME_STOPWORDS)) + r')\s+)+')
+
+
+def _entity(match: re.Match) -> Optional[Tuple[str, str, int, int]]:
+    """(kind, value, start, end) for a match, trimming leading stopwords off names"""
+    kind = match.lastgroup
+    value = match.group(0)
+    start = match.start()
+    if kind == "NAME":
+        lead = NAME_LEAD.match(value)
+        if lead:
+            value = value[lead.end():]
+            start += lead.end()
+        value = value.rstrip(".")
+        if len(value.split()) < 2:
+            return None
+    return kind, value, start, start + len(value)
+
+
+def mask_entities(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Replace dates, amounts, quoted terms, names and numbers with placeholders"""
+    parts = []
+    entities = []
+    pos = 0
+    for match in ENTITY_PATTERN.finditer(text):
+        found = _entity(match)
+        if found is None:
+            continue
+        kind, value, start, end = found
+        parts.append(text[pos:start])
+        parts.append(f" _{kind.lower()}_ ")
+        entities.append((kind, value))
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts), entities
+
+
+def normalize(masked: str) -> List[str]:
+    return re.findall(r"[\w']+", masked.lower())
+
+
+def minhash(words: List[str]) -> array:
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles]
+    return array("Q", (min((a * h + b) % _PRIME for h in hashes) for a, b in PERMUTATIONS))
+
+
+def band_keys(signature: array) -> List[bytes]:
+    raw = signature.tobytes()
+    width = ROWS * signature.itemsize
+    return [raw[i * width:(i + 1) * width] for i in range(BANDS)]
+
+
+class Fingerprint:
+    __slots__ = ("words", "entities", "critical", "signature")
+
+    def __init__(self, text: str):
+        masked, self.entities = mask_entities(text)
+        self.words = normalize(masked)
+        self.critical = sorted(word.lower() for word in CRITICAL_WORDS.findall(masked))
+        self.signature = minhash(self.words) if len(self.words) >= MIN_WORDS else None
+
+
+def similarity(a: array, b: array) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def leaks(result: str, stored_words: frozenset, words: List[str]) -> bool:
+    """
+    True if the stored output still contains a word of its source that the
+    new clause lacks, e.g. a one-word party name the entity masking missed
+    """
+    removed = stored_words.difference(words)
+    return bool(removed) and not removed.isdisjoint(normalize(result))
+
+
+def _overlap(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def aligned_pairs(clauses: List[str], sentences: List[str]) -> bool:
+    """
+    True if sentence i of an output plausibly simplifies clause i: same
+    count, and each pair shares more words with each other than with any
+    other clause or sentence, so reordered or merged outputs are refused
+    """
+    if len(clauses) != len(sentences):
+        return False
+    clause_words = [set(normalize(clause)) for clause in clauses]
+    sentence_words = [set(normalize(sentence)) for sentence in sentences]
+    scores = [[_overlap(c, s) for s in sentence_words] for c in clause_words]
+    for i, row in enumerate(scores):
+        if row[i] == 0 or any(row[j] >= row[i] or scores[j][i] >= row[i] for j in range(len(row)) if j != i):
+            return False
+    return True
+
+
+def _whole(value: str) -> str:
+    """Pattern for value not embedded in a longer word or number"""
+    return r'(?<![\w])' + re.escape(value) + r'(?![\w])'
+
+
+def substitute(result: str, old: List[Tuple[str, str]], new: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Carry a stored simplification over to the new clause's entities. Fails
+    (None) if the entity kinds differ or a changed entity cannot be found in
+    the stored output, so another document's names or figures never leak.
+    """
+    if [kind for kind, _ in old] != [kind for kind, _ in new]:
+        return None
+    replacements = {}
+    for (_, old_value), (_, new_value) in zip(old, new):
+        if old_value == new_value:
+            continue
+        if replacements.get(old_value, new_value) != new_value or not re.search(_whole(old_value), result):
+            return None
+        replacements[old_value] = new_value
+    if not replacements:
+        return result
+    pattern = re.compile("|".join(_whole(value) for value in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], result)
+
+
+def init_clause_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS clause_index (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scope TEXT NOT NULL,
+        source_text TEXT NOT NULL,
+        result_text TEXT NOT NULL,
+        entities TEXT NOT NULL,
+        critical TEXT NOT NULL,
+        signature BLOB NOT NULL,
+        words TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (scope, source_text)
+    )
+    ''')
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(clause_index)")}
+    if "words" not in columns:
+        cursor.execute("ALTER TABLE clause_index ADD COLUMN words TEXT")  # filled from source_text on load
+
+
+class ClauseIndex:
+    """
+    Past clause simplifications keyed by MinHash signatures of the clause
+    with its entities masked. LSH bands find candidates in memory; a
+    candidate is reused only if its estimated similarity clears the
+    threshold, its meaning-changing words match exactly, its output keeps
+    no source word missing from the new clause and its entities can be
+    substituted. Rows live in SQLite and are loaded on first use;
+    rows added by other worker processes are picked up every
+    refresh_interval seconds.
+    """
+
+    def __init__(self, db_path: str, threshold: float = SIMILARITY_THRESHOLD,
+                 refresh_interval: float = REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.stats = {"lookups": 0, "hits": 0, "rejected": 0, "added": 0, "unaligned": 0, "clauses": 0}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._synced_at = 0.0
+        self._last_id = 0
+        self._clauses: Dict[int, Tuple] = {}
+        self._bands: List[Dict[Tuple[str, bytes], List[int]]] = [{} for _ in range(BANDS)]
+
+    def _index(self, clause_id: int, scope: str, result: str, entities: List, critical: List,
+               signature: array, words: List[str]):
+        if clause_id in self._clauses:
+            return
+        self._clauses[clause_id] = (scope, result, entities, critical, signature, frozenset(words))
+        for band, key in zip(self._bands, band_keys(signature)):
+            band.setdefault((scope, key), []).append(clause_id)
+        self.stats["clauses"] = len(self._clauses)
+
+    def _ensure_loaded(self):
+        if self._loaded and time.monotonic() - self._synced_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._loaded and time.monotonic() - self._synced_at < self.refresh_interval:
+                return
+            conn = sqlite3.connect(self.db_path)
+            try:
+                rows = conn.execute(
+                    "SELECT id, scope, source_text, result_text, entities, critical, signature, words "
+                    "FROM clause_index "
+                    "WHERE id > ? ORDER BY id", (self._last_id,)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                rows = []  # table not created yet
+            conn.close()
+            for clause_id, scope, source, result, entities, critical, blob, words in rows:
+                signature = array("Q")
+                signature.frombytes(blob)
+                words = json.loads(words) if words else Fingerprint(source).words
+                self._index(clause_id, scope, result, [tuple(e) for e in json.loads(entities)],
+                            json.loads(critical), signature, words)
+                self._last_id = clause_id
+            self._loaded = True
+            self._synced_at = time.monotonic()
+
+    def lookup(self, text: str, scope: str) -> Optional[str]:
+        """Stored simplification adapted to this clause, or None"""
+        fingerprint = Fingerprint(text)
+        if fingerprint.signature is None:
+            return None
+        self._ensure_loaded()
+        with self._lock:
+            self.stats["lookups"] += 1
+            candidates = set()
+            for band, key in zip(self._bands, band_keys(fingerprint.signature)):
+                candidates.update(band.get((scope, key), ()))
+            ranked = sorted(
+                ((similarity(fingerprint.signature, self._clauses[c][4]), c) for c in candidates),
+                reverse=True
+            )
+            reused = None
+            for score, clause_id in ranked:
+                if score < self.threshold:
+                    break
+                _, result, entities, critical, _, words = self._clauses[clause_id]
+                if critical == fingerprint.critical and not leaks(result, words, fingerprint.words):
+                    reused = substitute(result, entities, fingerprint.entities)
+                if reused is None:
+                    self.stats["rejected"] += 1
+                    continue
+                self.stats["hits"] += 1
+                break
+        return reused
+
+    def add(self, text: str, result: str, scope: str):
+        """Remember an LLM simplification of one clause"""
+        self.add_many([(text, result)], scope)
+
+    def add_aligned(self, clauses: List[str], output: str, scope: str) -> int:
+        """
+        Remember a simplification of several clauses made in one LLM call.
+        Clause i is paired with sentence i of the output, which is only
+        trusted when aligned_pairs() accepts the whole pairing.
+        """
+        sentences = [sentence for sentence in parse_document(output).sentences() if sentence.strip()]
+        if not aligned_pairs(clauses, sentences):
+            with self._lock:
+                self.stats["unaligned"] += 1
+            return 0
+        return self.add_many(list(zip(clauses, sentences)), scope)
+
+    def add_many(self, pairs: List[Tuple[str, str]], scope: str) -> int:
+        """Store (clause, simplification) pairs in one transaction; returns how many were new"""
+        rows = []
+        for text, result in pairs:
+            fingerprint = Fingerprint(text)
+            if fingerprint.signature is not None and result:
+                rows.append((text, result, fingerprint))
+        if not rows:
+            return 0
+        self._ensure_loaded()
+        added = []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for text, result, fingerprint in rows:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO clause_index "
+                    "(scope, source_text, result_text, entities, critical, signature, words) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (scope, text, result, json.dumps(fingerprint.entities), json.dumps(fingerprint.critical),
+                     fingerprint.signature.tobytes(), json.dumps(fingerprint.words))
+                )
+                if cursor.rowcount:
+                    added.append((cursor.lastrowid, result, fingerprint))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            for clause_id, result, fingerprint in added:
+                self._index(clause_id, scope, result, fingerprint.entities, fingerprint.critical,
+                            fingerprint.signature, fingerprint.words)
+            self.stats["added"] += len(added)
+        return len(added)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, threshold=self.threshold, loaded=self._loaded)
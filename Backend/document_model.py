@@ -0,0 +1,55 @@
+# Backend/document_model.py
+# Parsed document shared by the risk, simplification and incremental stages.
+import bisect
+import re
+from array import array
+from typing import Iterator, Tuple, Union
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class ParsedDocument:
+    """
+    Text segmented into sentences exactly once. Sentence boundaries are kept
+    as compact arrays of start/end offsets into the original string, so every
+    stage works with exact offsets instead of re-splitting and re-counting.
+    """
+    __slots__ = ("text", "starts", "ends")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = array("q")
+        self.ends = array("q")
+        start = 0
+        for boundary in SENTENCE_BOUNDARY.finditer(text):
+            self.starts.append(start)
+            self.ends.append(boundary.start())
+            start = boundary.end()
+        if start < len(text) or not self.starts:
+            self.starts.append(start)
+            self.ends.append(len(text))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def sentence(self, index: int) -> str:
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def sentences(self) -> Iterator[str]:
+        text = self.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+    def spans(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+
+    def sentence_at(self, offset: int) -> int:
+        """Index of the sentence containing (or preceding) offset"""
+        return max(bisect.bisect_right(self.starts, offset) - 1, 0)
+
+
+def parse_document(text: Union[str, ParsedDocument]) -> ParsedDocument:
+    """Accept either raw text or an already parsed document"""
+    if isinstance(text, ParsedDocument):
+        return text
+    return ParsedDocument(text or "")
@@ -0,0 +1,169 @@
+# Backend/endpoint_prober.py
+# Background health prober for the translation endpoints.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# Default candidate endpoints for AI4Bharat translation
+AI4BHARAT_ENDPOINTS = [
+    "https://api.ai4bharat.org/translate",
+    "https://models.ai4bharat.org/translate/a2b",
+    "https://translate.ai4bharat.org/translate",
+]
+
+PROBE_INTERVAL = 60  # seconds between probe rounds
+PROBE_TIMEOUT = 10  # seconds per probe
+LATENCY_SMOOTHING = 0.3  # weight of the newest sample in the moving average
+FOLLOW_INTERVAL = 5  # seconds between reads of the shared table by non-probing workers
+LEASE_NAME = "endpoint-prober"
+
+
+def default_probe(endpoint: str, timeout: float) -> Dict:
+    """Send a tiny translation request and report the HTTP status"""
+    import requests
+
+    response = requests.post(
+        endpoint,
+        json={"text": "Hello world", "source": "en", "target": "hi"},
+        headers={"Content-Type": "application/json"},
+        timeout=timeout
+    )
+    return {
+        "status": response.status_code,
+        "response": response.text[:200] if response.text else "No response body"
+    }
+
+
+class EndpointProber:
+    """
+    Probes candidate endpoints concurrently on a schedule and keeps a
+    health and latency table for each. Routing reads the table; nothing
+    else is mutated.
+
+    With a shared state (shared_state.py) only the worker process holding
+    the prober lease probes; it publishes the table and the other workers
+    copy it, so every worker routes the same way.
+    """
+
+    def __init__(self, endpoints: List[str], probe: Callable[[str, float], Dict] = default_probe,
+                 interval: float = PROBE_INTERVAL, timeout: float = PROBE_TIMEOUT, shared=None):
+        self.endpoints = list(endpoints)
+        self.shared = shared
+        self.probe = probe
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._table = {
+            endpoint: {
+                "healthy": None,
+                "status": None,
+                "latency_ms": None,
+                "avg_latency_ms": None,
+                "last_checked": None,
+                "consecutive_failures": 0,
+                "error": None,
+            }
+            for endpoint in self.endpoints
+        }
+
+    def _probe_one(self, endpoint: str) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = self.probe(endpoint, self.timeout)
+            result["healthy"] = 200 <= result.get("status", 0) < 300
+        except Exception as e:
+            result = {"healthy": False, "status": None, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def probe_all(self) -> Dict:
+        """Run one probe round across all endpoints concurrently"""
+        with ThreadPoolExecutor(max_workers=len(self.endpoints) or 1) as pool:
+            results = dict(zip(self.endpoints, pool.map(self._probe_one, self.endpoints)))
+
+        checked_at = time.time()
+        with self._lock:
+            for endpoint, result in results.items():
+                entry = self._table[endpoint]
+                entry["healthy"] = result["healthy"]
+                entry["status"] = result.get("status")
+                entry["latency_ms"] = result["latency_ms"]
+                entry["last_checked"] = checked_at
+                entry["error"] = result.get("error")
+                if result["healthy"]:
+                    entry["consecutive_failures"] = 0
+                    if entry["avg_latency_ms"] is None:
+                        entry["avg_latency_ms"] = result["latency_ms"]
+                    else:
+                        entry["avg_latency_ms"] = round(
+                            LATENCY_SMOOTHING * result["latency_ms"]
+                            + (1 - LATENCY_SMOOTHING) * entry["avg_latency_ms"], 1
+                        )
+                else:
+                    entry["consecutive_failures"] += 1
+        return self.snapshot()
+
+    def best_endpoint(self) -> str:
+        """
+        Healthiest, fastest endpoint. Falls back to the endpoint with the
+        fewest recent failures, then to the first configured one.
+        """
+        with self._lock:
+            healthy = [
+                (entry["avg_latency_ms"], endpoint)
+                for endpoint, entry in self._table.items()
+                if entry["healthy"]
+            ]
+            if healthy:
+                return min(healthy)[1]
+            return min(
+                self.endpoints,
+                key=lambda endpoint: (self._table[endpoint]["consecutive_failures"],
+                                      self.endpoints.index(endpoint))
+            )
+
+    def snapshot(self) -> Dict:
+        """Copy of the health table, safe to return from an endpoint"""
+        with self._lock:
+            return {endpoint: dict(entry) for endpoint, entry in self._table.items()}
+
+    def load_shared(self):
+        """Copy the table published by the probing worker"""
+        published = self.shared.load_health()
+        with self._lock:
+            for endpoint, entry in published.items():
+                if endpoint in self._table:
+                    self._table[endpoint].update(entry)
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.interval
+            try:
+                if self.shared is None:
+                    self.probe_all()
+                elif self.shared.try_lease(LEASE_NAME, self.interval * 2 + self.timeout):
+                    self.shared.publish_health(self.probe_all())
+                else:
+                    self.load_shared()
+                    wait = min(self.interval, FOLLOW_INTERVAL)
+            except Exception as e:
+                print(f"Error in endpoint prober: {e}")
+            self._stop.wait(wait)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="endpoint-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+        if self.shared is not None:
+            self.shared.release_lease(LEASE_NAME)
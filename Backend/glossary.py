@@ -0,0 +1,43 @@
+# Backend/glossary.py
+# Per-language legal term glossaries for the fallback translation path.
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional
+
+GLOSSARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "glossaries")
+
+
+class Glossary:
+    """
+    A language's term dictionary compiled into one alternation pattern, so a
+    text is translated term-by-term in a single scan. Longer terms are tried
+    first, so multi-word entries win over their single-word prefixes.
+    """
+    __slots__ = ("code", "language", "prefix", "terms", "pattern")
+
+    def __init__(self, code: str, language: str, prefix: str, terms: Dict[str, str]):
+        self.code = code
+        self.language = language
+        self.prefix = prefix
+        self.terms = {english.lower(): translated for english, translated in terms.items()}
+        alternatives = "|".join(re.escape(term) for term in sorted(self.terms, key=len, reverse=True))
+        self.pattern = re.compile(r'\b(?:' + alternatives + r')\b', re.IGNORECASE) if self.terms else None
+
+    def apply(self, text: str) -> str:
+        if self.pattern is None or not text:
+            return text
+        terms = self.terms
+        return self.pattern.sub(lambda match: terms[match.group(0).lower()], text)
+
+
+@lru_cache(maxsize=None)
+def load_glossary(code: str) -> Optional[Glossary]:
+    """Load and compile glossaries/<code>.json once; None if there is no file"""
+    path = os.path.join(GLOSSARY_DIR, f"{code}.json")
+    if not re.fullmatch(r'[a-z]{2,3}', code or "") or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return Glossary(code, data.get("language", code), data.get("prefix", ""), data.get("terms", {}))
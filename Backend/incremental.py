@@ -0,0 +1,164 @@
+# Backend/incremental.py
+# Segment-level incremental re-analysis of edited documents.
+import difflib
+import json
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+from document_model import ParsedDocument
+
+
+def shift_risks(risks: List[Dict], offset: int) -> List[Dict]:
+    """Copy segment-local risks into document coordinates"""
+    shifted = []
+    for risk in risks:
+        risk = dict(risk)
+        risk["start"] += offset
+        risk["end"] += offset
+        shifted.append(risk)
+    return shifted
+
+
+def process_segments(doc: ParsedDocument, previous: List[Dict], transform: Callable[[str], str],
+                     find_risks: Callable[[str], List[Dict]],
+                     project_risks: Optional[Callable[[str, str, List[Dict]], List[Dict]]] = None
+                     ) -> Tuple[List[Dict], Dict]:
+    """
+    Match the document's sentences against the previously stored
+    segments. Unchanged segments keep their stored result and risks; only
+    new or edited segments go through transform and find_risks. With
+    project_risks(source, result, source_risks) the result's risks are
+    mapped from the source's instead of searched for in the result.
+    """
+    sources = list(doc.sentences())
+    matcher = difflib.SequenceMatcher(None, [seg["source"] for seg in previous], sources, autojunk=False)
+
+    reused_from: List[Optional[int]] = [None] * len(sources)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(new_end - new_start):
+                reused_from[new_start + offset] = old_start + offset
+
+    segments = []
+    reused = 0
+    for source, old_index in zip(sources, reused_from):
+        if old_index is not None:
+            segments.append(previous[old_index])
+            reused += 1
+        elif not source.strip():
+            segments.append({"source": source, "result": source, "source_risks": [], "result_risks": []})
+        else:
+            result = transform(source)
+            source_risks = find_risks(source)
+            segments.append({
+                "source": source,
+                "result": result,
+                "source_risks": source_risks,
+                "result_risks": (project_risks(source, result, source_risks) if project_risks
+                                 else find_risks(result)),
+            })
+
+    stats = {"segments": len(segments), "reused": reused, "recomputed": len(segments) - reused}
+    return segments, stats
+
+
+def strip_repeated_prefix(segments: List[Dict], prefix: str) -> List[Dict]:
+    """
+    Keep a per-call marker (e.g. the fallback translation's "[... translation] ")
+    on the first non-empty result only, as if the document had been
+    translated in one call. Result risks are shifted to the stripped text.
+    """
+    stripped = []
+    first = True
+    for segment in segments:
+        result = segment["result"]
+        if result and not first and prefix and result.startswith(prefix):
+            result = result[len(prefix):]
+            risks = []
+            for risk in shift_risks(segment["result_risks"], -len(prefix)):
+                risk["start"] = max(risk["start"], 0)
+                if risk["end"] > risk["start"]:
+                    if "text" in risk:
+                        risk["text"] = result[risk["start"]:risk["end"]]
+                    risks.append(risk)
+            segment = dict(segment, result=result, result_risks=risks)
+        first = first and not result
+        stripped.append(segment)
+    return stripped
+
+
+def assemble(doc: ParsedDocument, segments: List[Dict]) -> Dict:
+    """
+    Stitch per-segment results back into whole-document output and shift
+    segment-local risk offsets into document coordinates.
+    """
+    source_risks = []
+    result_parts = []
+    result_risks = []
+    result_pos = 0
+    for start, segment in zip(doc.starts, segments):
+        source_risks.extend(shift_risks(segment["source_risks"], start))
+        if not segment["result"]:
+            continue
+        if result_parts:
+            result_pos += 1
+        result_risks.extend(shift_risks(segment["result_risks"], result_pos))
+        result_parts.append(segment["result"])
+        result_pos += len(segment["result"])
+    return {
+        "result_text": " ".join(result_parts),
+        "source_risks": source_risks,
+        "result_risks": result_risks,
+    }
+
+
+def init_segment_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_segments (
+        document_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        language TEXT,  -- variant: target language for translate, level:model for simplify
+        source_text TEXT,
+        result_text TEXT,
+        source_risks TEXT,
+        result_risks TEXT,
+        PRIMARY KEY (document_id, kind, position),
+        FOREIGN KEY (document_id) REFERENCES documents (id)
+    )
+    ''')
+
+
+def load_segments(conn: sqlite3.Connection, document_id: int, kind: str,
+                  variant: Optional[str] = None) -> List[Dict]:
+    """Stored segments, only if they were produced for this variant (any variant when None)"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT source_text, result_text, source_risks, result_risks FROM document_segments "
+        "WHERE document_id = ? AND kind = ? AND (? IS NULL OR language = ?) ORDER BY position",
+        (document_id, kind, variant, variant)
+    )
+    return [
+        {
+            "source": row[0],
+            "result": row[1],
+            "source_risks": json.loads(row[2] or "[]"),
+            "result_risks": json.loads(row[3] or "[]"),
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+def save_segments(conn: sqlite3.Connection, document_id: int, kind: str, segments: List[Dict],
+                  variant: Optional[str] = None):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM document_segments WHERE document_id = ? AND kind = ?", (document_id, kind))
+    cursor.executemany(
+        "INSERT INTO document_segments (document_id, kind, position, language, source_text, "
+        "result_text, source_risks, result_risks) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (document_id, kind, position, variant, seg["source"], seg["result"],
+             json.dumps(seg["source_risks"]), json.dumps(seg["result_risks"]))
+            for position, seg in enumerate(segments)
+        ]
+    )
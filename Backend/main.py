@@ -1,28 +1,51 @@
 # Backend/main.py (with LLM integration and AI4Bharat translation)
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 import sqlite3
-import pytesseract
-from PIL import Image
-import fitz  # PyMuPDF
-import io
 import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from pydantic import BaseModel
-import random
 import traceback
-import requests
 import json
 import time
 import os
+import threading
+from array import array
+from contextlib import asynccontextmanager
+from endpoint_prober import EndpointProber, AI4BHARAT_ENDPOINTS
+from document_model import ParsedDocument, parse_document
+from risk_spans import RiskSpans
+from risk_scoring import RiskScorer
+from response_encoding import dumps, encode_response, requested_fields, wants
+from simplification_backends import SimplificationBackend, HuggingFaceBackend, LocalSeq2SeqBackend
+from single_flight import SingleFlight, flight_key
+from search_index import init_search_index, search_documents
+from risk_store import init_risk_tables, store_risks, load_risk_summary, load_risk_spans, find_documents_by_risk, RISK_SOURCES
+from glossary import Glossary, load_glossary
+from incremental import (process_segments, strip_repeated_prefix, assemble, init_segment_table, load_segments,
+                         save_segments)
+from batch_jobs import StageLimiter, BatchJobStore, run_batch, STAGE_LIMITS, MAX_BATCH_SIZE
+from clause_index import ClauseIndex, init_clause_table
+from admission import AdmissionController
+from profiling import ProfileStore, ProfilingMiddleware
+from shared_state import SharedState, MetricsPublisher, sum_metrics
+from page_extraction import (init_page_table, iter_pdf_pages, iter_image_pages, count_pages,
+                             create_page_document, delete_page_document, write_page, write_page_text, load_pages)
+from write_behind import WriteBehindQueue
+from risk_projection import Alignment, translate_aligned, project_segment, project_risks
 
-# Set Tesseract path (update this if needed)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+# Tesseract path (update this if needed)
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+
+# Heavy modules (PyMuPDF, Tesseract, PIL, jose, passlib, requests, numpy) are imported
+# on first use so that importing this module stays cheap. Set WARMUP_ON_STARTUP=0
+# to skip loading them in the background once the app has started.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
 
 # LLM Configuration - Using Hugging Face Inference API for Mistral-7B
 LLM_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
@@ -30,10 +53,41 @@ LLM_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-
 # variable HF_API_TOKEN (for example: setx HF_API_TOKEN "your_token" on Windows or
 # export HF_API_TOKEN=your_token on Linux/macOS). Default is empty string.
 LLM_API_TOKEN = os.getenv("HF_API_TOKEN", "")
-LLM_TIMEOUT = 30  # seconds
+LLM_TIMEOUT = 90  # seconds, upper bound; per-call timeouts scale with the input (token_budget.py)
+
+# Simplification backend: "huggingface" (remote API) or "local" (CPU model, see
+# simplification_backends.py)
+SIMPLIFICATION_BACKEND = os.getenv("SIMPLIFICATION_BACKEND", HuggingFaceBackend.name)
+simplification_backend: Optional[SimplificationBackend] = None
+simplification_backend_lock = threading.Lock()  # the warm-up thread and requests may both create it
+
+# State shared by all worker processes (serve.py --workers N): result cache,
+# per-worker counters, endpoint health and the init lock (shared_state.py)
+shared_state = SharedState()
+result_cache_stats = {"hits": 0, "misses": 0, "stored": 0}
+
+# Identical concurrent simplifications/translations wait on one upstream call
+llm_flight = SingleFlight("llm")
+translation_flight = SingleFlight("translation")
+
+# Clause-level reuse of past simplifications for near-identical boilerplate
+# clauses (clause_index.py). Set CLAUSE_REUSE=0 to always call the LLM.
+CLAUSE_REUSE = os.getenv("CLAUSE_REUSE", "1") == "1"
+clause_index = ClauseIndex('legal_app.db', float(os.getenv("CLAUSE_REUSE_THRESHOLD", "0.85")))
+
+# Result writes from /extract-text, /simplify and /translate are group-committed
+# by a background writer (write_behind.py, WRITE_BEHIND_* variables); reads of a
+# user's documents first wait for that user's queued writes
+write_queue = WriteBehindQueue('legal_app.db')
+
+# Per-user rate limits and per-stage concurrency/queue limits for the OCR,
+# LLM and translation endpoints (admission.py, ADMISSION_* variables)
+admission = AdmissionController()
 
 # AI4Bharat Translation API Configuration
-AI4BHARAT_TRANSLATION_API = "https://api.ai4bharat.org/translate"
+# Candidate endpoints are probed in the background; requests are routed to
+# the healthiest, fastest one (see endpoint_prober.py)
+translation_prober = EndpointProber(AI4BHARAT_ENDPOINTS, shared=shared_state)
 
 AI4BHARAT_LANGUAGES = {
     "hindi": "hi",
@@ -65,16 +119,78 @@ class Token(BaseModel):
     token_type: str
     user_id: int
 
+# Pydantic models for batch processing
+class BatchDocument(BaseModel):
+    text: str
+    ref: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    documents: List[BatchDocument] = []
+    document_ids: List[int] = []
+    operations: List[str] = ["simplify"]
+    level: str = "simple"
+    language: str = "hindi"
+    risk_format: str = "full"
+    background: bool = False
+
 # JWT settings
 SECRET_KEY = "your-secret-key-here-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (CryptContext is created on first use)
+pwd_context = None
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-app = FastAPI()
+# Accounts allowed to profile requests and download profiles (comma-separated emails)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+def get_pwd_context():
+    global pwd_context
+    if pwd_context is None:
+        from passlib.context import CryptContext
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return pwd_context
+
+def get_tesseract():
+    import pytesseract
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+    return pytesseract
+
+def warm_up():
+    """Load heavy modules and the simplification backend ahead of the first request"""
+    started = time.perf_counter()
+    try:
+        get_pwd_context()
+        get_tesseract()
+        import fitz  # noqa: F401
+        import requests  # noqa: F401
+        from jose import jwt  # noqa: F401
+        from PIL import Image  # noqa: F401
+        import numpy  # noqa: F401
+        get_simplification_backend()
+        print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Warm-up error (non-critical): {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize database on startup, one worker process at a time
+    with shared_state.exclusive():
+        init_db()
+    write_queue.start()
+    translation_prober.start()
+    metrics_publisher.start()
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    yield
+    write_queue.close()
+    metrics_publisher.stop()
+    translation_prober.stop()
+    if simplification_backend is not None:
+        simplification_backend.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -85,6 +201,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request sampling profiler: X-Profile: 1 or ?profile=1 from an admin, or
+# PROFILE_SAMPLE_RATE for random background collection (profiling.py)
+profile_store = ProfileStore()
+
+def is_admin_request(headers: Dict[str, str]) -> bool:
+    """True if the request's bearer token belongs to an ADMIN_EMAILS account"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if not ADMIN_EMAILS or scheme.lower() != "bearer" or not token:
+        return False
+    from jose import JWTError, jwt
+    try:
+        user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return False
+    conn = sqlite3.connect('legal_app.db')
+    cursor = conn.cursor()
+    cursor.execute("SELECT email FROM users WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row is not None and row[0].lower() in ADMIN_EMAILS
+
+app.add_middleware(ProfilingMiddleware, store=profile_store, is_admin=is_admin_request)
+
 # Risk categories with color codes
 RISK_CATEGORIES = {
     "obligation": {"label": "Obligation", "color": "#3B82F6", "class": "obligation"},
@@ -103,10 +242,28 @@ RISK_PATTERNS = {
     "definition": [r"means\b", r"refers to\b", r"defined as\b", r"hereinafter\b", r"for the purposes of\b"],
 }
 
+COMPILED_RISK_PATTERNS = {
+    category: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for category, patterns in RISK_PATTERNS.items()
+}
+
+# Category index used by the compact risk format
+RISK_CATEGORY_ORDER = list(RISK_PATTERNS)
+
+# Confidence scoring (risk_scoring.py). RISK_SCORE_WEIGHTS may override feature
+# weights as JSON, e.g. {"negation": -0.2, "density": 0.05}
+risk_scorer = RiskScorer(
+    [pattern for patterns in RISK_PATTERNS.values() for pattern in patterns],
+    feature_weights=json.loads(os.getenv("RISK_SCORE_WEIGHTS", "{}"))
+)
+
 # Initialize SQLite database
 def init_db():
     conn = sqlite3.connect('legal_app.db')
     cursor = conn.cursor()
+
+    # Readers don't block the write-behind writer's commits, and vice versa
+    cursor.execute("PRAGMA journal_mode=WAL")
     
     # Create users table
     cursor.execute('''
@@ -131,113 +288,210 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users (id)
     )
     ''')
-    
+
+    # Per-segment results for incremental re-analysis
+    init_segment_table(cursor)
+
+    # Full-text search index, kept in sync by triggers
+    init_search_index(cursor)
+
+    # Persisted risk spans and per-category summaries
+    init_risk_tables(cursor)
+
+    # Extracted pages, stored one by one while a document is processed
+    init_page_table(cursor)
+
+    # Past clause simplifications for near-duplicate reuse
+    init_clause_table(cursor)
+
     conn.commit()
     conn.close()
 
-# Initialize database on startup
-init_db()
 
-def identify_legal_risks(text: str) -> List[Dict]:
-    """Identify legal risks in text using pattern matching"""
-    risks = []
+def detect_risk_spans(text: Union[str, ParsedDocument]) -> RiskSpans:
+    """Identify legal risks in text using pattern matching, as array-backed spans"""
+    doc = parse_document(text if isinstance(text, (str, ParsedDocument)) else "")
+    spans = RiskSpans(doc.text, RISK_CATEGORY_ORDER)
+    pattern_ids = array("H")
+    sentence_ids = array("q")
     try:
-        if not text or not isinstance(text, str):
-            return risks
-            
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        current_pos = 0
-        for sentence in sentences:
-            for category, patterns in RISK_PATTERNS.items():
+        text = doc.text
+        if not text:
+            return spans
+
+        for sentence_id, (start, end) in enumerate(doc.spans()):
+            pattern_id = 0
+            for category_id, patterns in enumerate(COMPILED_RISK_PATTERNS.values()):
                 for pattern in patterns:
                     try:
-                        matches = re.finditer(pattern, sentence, re.IGNORECASE)
-                        for match in matches:
-                            risks.append({
-                                "text": match.group(),
-                                "start": current_pos + match.start(),
-                                "end": current_pos + match.end(),
-                                "category": category,
-                                "label": RISK_CATEGORIES[category]["label"],
-                                "color": RISK_CATEGORIES[category]["color"],
-                                "class": RISK_CATEGORIES[category]["class"],
-                                "confidence": round(random.uniform(0.7, 0.95), 2)
-                            })
+                        for match in pattern.finditer(text, start, end):
+                            spans.append(match.start(), match.end(), category_id, 0.0)
+                            pattern_ids.append(pattern_id)
+                            sentence_ids.append(sentence_id)
                     except Exception as e:
                         print(f"Error in pattern matching: {e}")
-                        continue
-            current_pos += len(sentence) + 1
+                    pattern_id += 1
+
+        # Confidence for all spans at once
+        risk_scorer.score(spans, doc, pattern_ids, sentence_ids, RISK_CATEGORY_ORDER.index("condition"))
     except Exception as e:
         print(f"Error in identify_legal_risks: {e}")
     
+    return spans
+
+def identify_legal_risks(text: Union[str, ParsedDocument]) -> List[Dict]:
+    """Identify legal risks in text using pattern matching"""
+    return detect_risk_spans(text).to_dicts(RISK_CATEGORIES)
+
+def format_risks(risks: Union[RiskSpans, List[Dict]], risk_format: str = "full"):
+    """Render risks as a list of dicts (default) or the compact columnar format"""
+    if risk_format == "compact":
+        if not isinstance(risks, RiskSpans):
+            risks = RiskSpans.from_dicts("", risks, RISK_CATEGORY_ORDER)
+        return risks.to_compact(RISK_CATEGORIES)
+    if isinstance(risks, RiskSpans):
+        return risks.to_dicts(RISK_CATEGORIES)
     return risks
 
+def get_simplification_backend() -> SimplificationBackend:
+    """Backend selected by SIMPLIFICATION_BACKEND, created once on first use"""
+    global simplification_backend
+    if simplification_backend is not None:
+        return simplification_backend
+    with simplification_backend_lock:
+        if simplification_backend is None:
+            backend = None
+            if SIMPLIFICATION_BACKEND == LocalSeq2SeqBackend.name:
+                try:
+                    backend = LocalSeq2SeqBackend()
+                except Exception as e:
+                    print(f"Local simplification backend unavailable, using Hugging Face: {e}")
+            if backend is None:
+                backend = HuggingFaceBackend(LLM_API_URL, LLM_API_TOKEN, LLM_TIMEOUT)
+            simplification_backend = backend
+    return simplification_backend
+
 def simplify_with_llm(text: str, level: str = "simple") -> str:
     """
-    Simplify legal text using Mistral-7B LLM via Hugging Face API
+    Simplify legal text with the configured backend (Mistral-7B via the
+    Hugging Face API by default), falling back to rule-based simplification.
+    Concurrent identical requests share a single upstream call.
+    """
+    if not text or not isinstance(text, str):
+        return text
+    return simplify_with_backend(text, level) or simplify_text_rule_based(text, level)
+
+def simplify_with_backend(text: str, level: str = "simple") -> Optional[str]:
+    """Backend output only, None when the backend failed"""
+    key = flight_key(text, level, get_simplification_backend().model)
+    return llm_flight.do(key, cached_call, f"llm:{key}", run_simplification_backend, text, level)
+
+def cached_call(key: str, func, *args):
     """
+    Result from the cache shared by all workers, or func(*args) stored there.
+    None results (upstream failures) are not cached.
+    """
+    cached = shared_state.cache_get(key)
+    if cached is not None:
+        result_cache_stats["hits"] += 1
+        return cached
+    result_cache_stats["misses"] += 1
+    result = func(*args)
+    if result is not None:
+        shared_state.cache_set(key, result)
+        result_cache_stats["stored"] += 1
+    return result
+
+def run_simplification_backend(text: str, level: str = "simple") -> Optional[str]:
     try:
-        if not text or not isinstance(text, str):
-            return text
-        
-        # Truncate very long text to avoid API limits
-        if len(text) > 4000:
-            text = text[:4000] + "... [text truncated]"
-        
-        prompt = f"""
-        You are a legal expert specializing in simplifying complex legal documents for non-lawyers.
-        
-        Please simplify the following legal text to make it easy for a layperson to understand.
-        Keep the meaning exactly the same but use plain language.
-        Break down complex sentences and replace legal jargon with everyday words.
-        
-        Legal text to simplify:
-        {text}
-        
-        Simplified version:
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {LLM_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 1024,
-                "temperature": 0.3,
-                "do_sample": True,
-                "return_full_text": False
-            }
-        }
-        
-        response = requests.post(
-            LLM_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=LLM_TIMEOUT
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            simplified_text = result[0]['generated_text'].strip()
-            
-            # Clean up the response
-            simplified_text = re.sub(r'^Simplified version:\s*', '', simplified_text)
-            simplified_text = re.sub(r'\n+', '\n', simplified_text).strip()
-            
-            return simplified_text
-        else:
-            print(f"LLM API error: {response.status_code} - {response.text}")
-            # Fall back to rule-based simplification
-            return simplify_text_rule_based(text, level)
-            
+        return get_simplification_backend().simplify(text, level) or None
     except Exception as e:
         print(f"Error in simplify_with_llm: {e}")
-        # Fall back to rule-based simplification
-        return simplify_text_rule_based(text, level)
+        return None
+
+def clause_scope(level: str) -> str:
+    return f"{level}:{get_simplification_backend().model}"
+
+def simplify_clause(clause: str, level: str = "simple", lookup: bool = True) -> str:
+    """
+    Simplify one clause, reusing a stored simplification of a near-identical
+    clause when there is one. New backend outputs are added to the index;
+    rule-based fallbacks are not.
+    """
+    if not CLAUSE_REUSE:
+        return simplify_with_llm(clause, level)
+    scope = clause_scope(level)
+    if lookup:
+        reused = clause_index.lookup(clause, scope)
+        if reused is not None:
+            return reused
+    return simplify_run([clause], level)[0]
+
+def simplify_run(clauses: List[str], level: str = "simple", text: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Simplify consecutive clauses (or text, when it is exactly those clauses)
+    in one backend call and index the output clause by clause when it splits
+    into one sentence per clause. Returns the simplified text and the number
+    of clauses newly indexed.
+    """
+    if not clauses:
+        return "", 0
+    text = text or " ".join(clauses)
+    simplified = simplify_with_backend(text, level)
+    if simplified is None:
+        return simplify_text_rule_based(text, level), 0
+    if len(clauses) == 1:
+        clause_index.add(clauses[0], simplified, clause_scope(level))
+        return simplified, 1
+    return simplified, clause_index.add_aligned(clauses, simplified, clause_scope(level))
+
+def simplify_with_clause_reuse(text: Union[str, ParsedDocument], level: str = "simple"
+                               ) -> Tuple[str, Optional[Dict]]:
+    """
+    Reuse stored simplifications for boilerplate clauses and send only the
+    novel ones to the LLM, as runs of consecutive clauses so context within
+    a run is kept. With no reusable clause the whole text goes to the LLM
+    in one call, as before. Either way the new outputs are indexed, so
+    later documents can reuse them. Accepts an already parsed document.
+    """
+    doc = text if isinstance(text, ParsedDocument) else None
+    if doc is not None:
+        text = doc.text
+    if not CLAUSE_REUSE or not text or not isinstance(text, str):
+        return simplify_with_llm(text, level), None
+
+    clauses = list(parse_document(doc or text).sentences())
+    if len(clauses) == 1:
+        return simplify_clause(text, level), None
+    scope = clause_scope(level)
+    reused = [clause_index.lookup(clause, scope) for clause in clauses]
+    stats = {"clauses": len(clauses), "reused": sum(r is not None for r in reused), "llm_calls": 0, "indexed": 0}
+    if not stats["reused"]:
+        stats["llm_calls"] = 1
+        simplified, stats["indexed"] = simplify_run([clause for clause in clauses if clause.strip()], level, text)
+        return simplified, stats
+
+    parts = []
+    run: List[str] = []
+
+    def flush():
+        if not run:
+            return
+        stats["llm_calls"] += 1
+        simplified, indexed = simplify_run(run, level)
+        parts.append(simplified)
+        stats["indexed"] += indexed
+        run.clear()
+
+    for clause, stored in zip(clauses, reused):
+        if stored is None:
+            if clause.strip():
+                run.append(clause)
+            continue
+        flush()
+        parts.append(stored)
+    flush()
+    return " ".join(part for part in parts if part), stats
 
 def simplify_text_rule_based(text: str, level: str = "simple") -> str:
     """
@@ -290,10 +544,9 @@ def simplify_text_rule_based(text: str, level: str = "simple") -> str:
             text = re.sub(r'\b' + complex_term + r'\b', simple_term, text, flags=re.IGNORECASE)
         
         # Break long sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
         simplified_sentences = []
         
-        for sentence in sentences:
+        for sentence in parse_document(text).sentences():
             if len(sentence.split()) > 25:  # Long sentence
                 # Simple splitting for demonstration
                 parts = re.split(r'[,;:]', sentence)
@@ -334,12 +587,14 @@ def translate_with_ai4bharat(text: str, target_lang: str = "hindi") -> str:
             "Accept": "application/json"
         }
         
-        print(f"Making request to: {AI4BHARAT_TRANSLATION_API}")
+        endpoint = translation_prober.best_endpoint()
+        print(f"Making request to: {endpoint}")
         print(f"Payload: {json.dumps(payload)}")
         
         # Make the API request
+        import requests
         response = requests.post(
-            AI4BHARAT_TRANSLATION_API,
+            endpoint,
             json=payload,
             headers=headers,
             timeout=30
@@ -379,7 +634,7 @@ def translate_with_ai4bharat(text: str, target_lang: str = "hindi") -> str:
         elif response.status_code == 405:
             print("API endpoint doesn't support POST method, trying GET...")
             # Try GET request as fallback
-            return translate_with_ai4bharat_get(text, target_lang)
+            return translate_with_ai4bharat_get(text, target_lang, endpoint)
         else:
             print(f"AI4Bharat API error: {response.status_code} - {response.text}")
             return f"[{target_lang.capitalize()} translation error: HTTP {response.status_code}]"
@@ -389,11 +644,12 @@ def translate_with_ai4bharat(text: str, target_lang: str = "hindi") -> str:
         traceback.print_exc()
         return f"[{target_lang.capitalize()} translation error: {str(e)}]"
 
-def translate_with_ai4bharat_get(text: str, target_lang: str = "hindi") -> str:
+def translate_with_ai4bharat_get(text: str, target_lang: str = "hindi", endpoint: Optional[str] = None) -> str:
     """
     Alternative GET method for AI4Bharat translation
     """
     try:
+        endpoint = endpoint or translation_prober.best_endpoint()
         lang_code = AI4BHARAT_LANGUAGES.get(target_lang.lower(), "hi")
         
         params = {
@@ -402,8 +658,9 @@ def translate_with_ai4bharat_get(text: str, target_lang: str = "hindi") -> str:
             "target": lang_code
         }
         
+        import requests
         response = requests.get(
-            AI4BHARAT_TRANSLATION_API,
+            endpoint,
             params=params,
             headers={"Accept": "application/json"},
             timeout=30
@@ -423,8 +680,29 @@ def translate_with_ai4bharat_get(text: str, target_lang: str = "hindi") -> str:
 
 def get_translation(text: str, target_lang: str = "hindi") -> str:
     """
-    Main translation function with multiple fallback options
+    Main translation function with multiple fallback options. Concurrent
+    identical requests share a single upstream call.
     """
+    if not text or not isinstance(text, str):
+        return translate_with_fallbacks(text, target_lang)
+    key = flight_key(text, target_lang.lower())
+    return translation_flight.do(key, translate_cached, key, text, target_lang)
+
+def translate_cached(key: str, text: str, target_lang: str = "hindi") -> str:
+    """Remote translations go through the shared cache; glossary fallbacks are not cached"""
+    translated = cached_call(f"translation:{key}", translate_remote, text, target_lang)
+    if translated is None:
+        return get_mock_translation(text, target_lang)
+    return translated
+
+def translate_with_fallbacks(text: str, target_lang: str = "hindi") -> str:
+    translated = translate_remote(text, target_lang)
+    if translated is None:
+        return get_mock_translation(text, target_lang)
+    return translated
+
+def translate_remote(text: str, target_lang: str = "hindi") -> Optional[str]:
+    """AI4Bharat, then Google Translate; None when both fail"""
     # Try AI4Bharat first
     result = translate_with_ai4bharat(text, target_lang)
     
@@ -443,68 +721,52 @@ def get_translation(text: str, target_lang: str = "hindi") -> str:
             print("googletrans not installed")
         except Exception as e:
             print(f"Google Translate failed: {e}")
-        
-        # Fallback to mock translation
-        return get_mock_translation(text, target_lang)
+        return None
     
     return result
 
 def get_mock_translation(text: str, target_lang: str = "hindi") -> str:
     """
-    Comprehensive mock translation with actual Hindi words
+    Glossary-based fallback translation: legal terms are replaced from the
+    target language's glossary (glossaries/<code>.json) in a single pass
     """
-    # Common legal terms translations
-    legal_terms = {
-        "shall": "करेगा",
-        "must": "अवश्य",
-        "required": "आवश्यक",
-        "obligation": "दायित्व",
-        "penalty": "जुर्माना",
-        "contract": "अनुबंध",
-        "agreement": "समझौता",
-        "party": "पक्ष",
-        "damages": "क्षतिपूर्ति",
-        "liable": "उत्तरदायी",
-        "indemnify": "क्षतिपूर्ति करना",
-        "breach": "उल्लंघन",
-        "condition": "शर्त",
-        "right": "अधिकार",
-        "duty": "कर्तव्य",
-        "payment": "भुगतान",
-        "termination": "समाप्ति",
-        "clause": "धारा",
-        "section": "अनुभाग"
-    }
-    
-    # Translate common legal terms
-    translated_text = text
-    for english, hindi in legal_terms.items():
-        translated_text = re.sub(r'\b' + english + r'\b', hindi, translated_text, flags=re.IGNORECASE)
-    
-    # Add language prefix
-    lang_prefixes = {
-        "hindi": "[हिंदी अनुवाद] ",
-        "bengali": "[বাংলা অনুবাদ] ",
-        "tamil": "[தமிழ் மொழிபெயர்ப்பு] ",
-        "telugu": "[తెలుగు అనువాదం] ",
-        "marathi": "[मराठी भाषांतर] ",
-        "gujarati": "[ગુજરાતી અનુવાદ] ",
-        "kannada": "[ಕನ್ನಡ ಅನುವಾದ] ",
-        "malayalam": "[മലയാളം വിവർത്തനം] ",
-        "punjabi": "[ਪੰਜਾਬੀ ਅਨੁਵਾਦ] ",
-        "odia": "[ଓଡିଆ ଅନୁବାଦ] ",
-        "assamese": "[অসমীয়া অনুবাদ] "
-    }
-    
-    prefix = lang_prefixes.get(target_lang.lower(), f"[{target_lang} translation] ")
-    return prefix + translated_text
+    glossary = translation_glossary(target_lang)
+    if glossary is None:
+        return mock_translation_prefix(target_lang) + text
+    return glossary.prefix + glossary.apply(text)
+
+def translation_glossary(target_lang: str) -> Optional[Glossary]:
+    return load_glossary(AI4BHARAT_LANGUAGES.get(target_lang.lower(), ""))
+
+def mock_translation_prefix(target_lang: str) -> str:
+    """Marker the fallback translation puts before its output"""
+    glossary = translation_glossary(target_lang)
+    return glossary.prefix if glossary is not None else f"[{target_lang} translation] "
 
-def add_color_annotations(text: str, risks: List[Dict]) -> str:
+def translate_with_alignment(text: Union[str, ParsedDocument], target_lang: str = "hindi") -> Alignment:
+    """Translate in a single call (a few for long texts), keeping the layout and where each sentence lands"""
+    return translate_aligned(parse_document(text), lambda lines: get_translation(lines, target_lang),
+                             fallback_prefix=mock_translation_prefix(target_lang))
+
+def project_translated_risks(source: str, result: str, source_risks: List[Dict],
+                             glossary: Optional[Glossary]) -> List[Dict]:
+    """Risks of one source sentence mapped onto its translation (segment-local offsets)"""
+    spans = [(risk["start"], risk["end"], RISK_CATEGORY_ORDER.index(risk["category"]), risk.get("confidence", 0.8))
+             for risk in source_risks]
+    projected = RiskSpans(result, RISK_CATEGORY_ORDER)
+    for span in project_segment(source, result, spans, glossary):
+        projected.append(*span)
+    return projected.to_dicts(RISK_CATEGORIES)
+
+def add_color_annotations(text: str, risks: Union[RiskSpans, List[Dict]]) -> str:
     """Add HTML span tags with color coding for risks"""
     if not text or not risks:
         return text or ""
     
     try:
+        if isinstance(risks, RiskSpans):
+            risks = risks.to_dicts(RISK_CATEGORIES)
+
         # Sort risks by start position in reverse order to avoid offset issues
         risks_sorted = sorted(risks, key=lambda x: x['start'], reverse=True)
         
@@ -534,10 +796,10 @@ def add_color_annotations(text: str, risks: List[Dict]) -> str:
 
 # Password utilities
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 # User utilities
 def get_user_by_email(email: str):
@@ -576,6 +838,7 @@ def create_user(name: str, email: str, password: str):
 
 # JWT utilities
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -591,6 +854,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -613,6 +877,136 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         "email": user[2]
     }
 
+# Document utilities
+def resolve_document_id(cursor, user_id: int, document_id: Optional[int] = None) -> Optional[int]:
+    """Return the given document if it belongs to the user, else the user's latest document"""
+    if document_id is not None:
+        cursor.execute("SELECT id FROM documents WHERE id = ? AND user_id = ?", (document_id, user_id))
+    else:
+        cursor.execute("SELECT id FROM documents WHERE user_id = ? ORDER BY id DESC LIMIT 1", (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+async def read_your_writes(user_id: int):
+    """Wait (off the event loop) until the user's queued writes are committed"""
+    if write_queue.pending(user_id):
+        await run_in_threadpool(write_queue.sync, user_id)
+
+def persist_results(user_id: int, columns: Dict[str, str], risk_sets: Dict[str, RiskSpans],
+                    document_id: Optional[int] = None) -> Optional[int]:
+    """
+    Queue the update of the user's document (latest by default) and its risk
+    index. The document is resolved now, so the write lands on the document
+    that was current for this request.
+    """
+    conn = sqlite3.connect('legal_app.db')
+    try:
+        document_id = resolve_document_id(conn.cursor(), user_id, document_id)
+    finally:
+        conn.close()
+    if document_id is not None:
+        write_queue.submit(user_id, write_results, document_id, user_id, columns, risk_sets)
+    return document_id
+
+def write_results(cursor, document_id: int, user_id: int, columns: Dict[str, str],
+                  risk_sets: Dict[str, RiskSpans]):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    cursor.execute(f"UPDATE documents SET {assignments} WHERE id = ?", (*columns.values(), document_id))
+    for source, spans in risk_sets.items():
+        store_risks(cursor, document_id, user_id, source, spans)
+
+def write_segment_results(cursor, document_id: int, user_id: int, kind: str, segments: List[Dict],
+                          variant: Optional[str], columns: Dict[str, str], risk_sets: Dict[str, RiskSpans]):
+    save_segments(cursor.connection, document_id, kind, segments, variant)
+    write_results(cursor, document_id, user_id, columns, risk_sets)
+
+def simplify_incremental(text: str, level: str, user_id: int, document_id: Optional[int] = None,
+                         risk_format: str = "full") -> Dict:
+    """
+    Re-simplify only the sentences that changed since the stored version of
+    the document; unchanged sentences reuse their stored results.
+    """
+    write_queue.sync(user_id)  # the previous version's segments may still be queued
+    conn = sqlite3.connect('legal_app.db')
+    try:
+        cursor = conn.cursor()
+        document_id = resolve_document_id(cursor, user_id, document_id)
+        if document_id is None:
+            cursor.execute("INSERT INTO documents (user_id, original_text) VALUES (?, ?)", (user_id, text))
+            document_id = cursor.lastrowid
+        previous = load_segments(conn, document_id, "simplify", clause_scope(level))
+        conn.commit()  # release the write lock before the slow per-segment calls
+    finally:
+        conn.close()
+
+    doc = parse_document(text)
+    segments, stats = process_segments(
+        doc, previous, lambda segment: simplify_clause(segment, level), identify_legal_risks
+    )
+    output = assemble(doc, segments)
+
+    write_queue.submit(
+        user_id, write_segment_results, document_id, user_id, "simplify", segments, clause_scope(level),
+        {"original_text": text, "simplified_text": output["result_text"]},
+        {"original": RiskSpans.from_dicts(text, output["source_risks"], RISK_CATEGORY_ORDER),
+         "simplified": RiskSpans.from_dicts(output["result_text"], output["result_risks"], RISK_CATEGORY_ORDER)}
+    )
+
+    print(f"Incremental simplify: reused {stats['reused']}/{stats['segments']} segments")
+    simplified = output["result_text"]
+    return {
+        "original_text": text,
+        "simplified_text": simplified,
+        "original_risks": format_risks(output["source_risks"], risk_format),
+        "simplified_risks": format_risks(output["result_risks"], risk_format),
+        "annotated_original": add_color_annotations(text, output["source_risks"]),
+        "annotated_simplified": add_color_annotations(simplified, output["result_risks"]),
+        "incremental": dict(stats, document_id=document_id),
+        "success": True
+    }
+
+def translate_incremental(text: str, target_lang: str, user_id: int, document_id: Optional[int] = None,
+                          risk_format: str = "full") -> Dict:
+    """Re-translate only the sentences that changed since the stored translation"""
+    write_queue.sync(user_id)  # the previous version's segments may still be queued
+    conn = sqlite3.connect('legal_app.db')
+    try:
+        cursor = conn.cursor()
+        document_id = resolve_document_id(cursor, user_id, document_id)
+        if document_id is None:
+            cursor.execute("INSERT INTO documents (user_id, original_text) VALUES (?, ?)", (user_id, text))
+            document_id = cursor.lastrowid
+        previous = load_segments(conn, document_id, "translate", target_lang)
+        conn.commit()  # release the write lock before the slow per-segment calls
+    finally:
+        conn.close()
+
+    doc = parse_document(text)
+    glossary = translation_glossary(target_lang)
+    segments, stats = process_segments(
+        doc, previous, lambda segment: get_translation(segment, target_lang), identify_legal_risks,
+        lambda source, result, risks: project_translated_risks(source, result, risks, glossary)
+    )
+    segments = strip_repeated_prefix(segments, mock_translation_prefix(target_lang))
+    output = assemble(doc, segments)
+
+    write_queue.submit(
+        user_id, write_segment_results, document_id, user_id, "translate", segments, target_lang,
+        {"translated_text": output["result_text"]},
+        {"translated": RiskSpans.from_dicts(output["result_text"], output["result_risks"], RISK_CATEGORY_ORDER)}
+    )
+
+    print(f"Incremental translate: reused {stats['reused']}/{stats['segments']} segments")
+    translated = output["result_text"]
+    return {
+        "original_text": text,
+        "translated_text": translated,
+        "risks": format_risks(output["result_risks"], risk_format),
+        "incremental": dict(stats, document_id=document_id),
+        "success": True,
+        "translation_service": "ai4bharat" if not translated.startswith('[') else "fallback"
+    }
+
 # Authentication endpoints
 @app.post("/signup", response_model=Token)
 async def signup(user: UserCreate):
@@ -756,197 +1150,535 @@ async def test_translate():
         traceback.print_exc()
         return {"error": error_msg, "success": False}
     
+def extract_pages(content: bytes, filename: str):
+    """Page iterator for a supported upload, or None"""
+    if filename.endswith(".pdf"):
+        return iter_pdf_pages(content, get_tesseract().image_to_string)
+    if filename.endswith((".png", ".jpg", ".jpeg")):
+        return iter_image_pages(content, get_tesseract().image_to_string)
+    return None
+
+def stream_extraction(pages, user_id: int, document_id: int, page_count: int, on_close=None):
+    """
+    NDJSON records: a header with the document_id, one record per page as
+    soon as it is extracted and queued for storage, then a summary. The
+    joined text is written to the document even if the client disconnects
+    part way. A document that got no page at all is deleted again.
+    """
+    started = time.perf_counter()
+    yield dumps({"type": "document", "document_id": document_id, "pages": page_count}) + b"\n"
+    done = 0
+    ocr_pages = 0
+    failed = False
+    try:
+        for page in pages:
+            write_queue.submit(user_id, write_page, document_id, page)
+            done += 1
+            ocr_pages += page["source"] == "ocr"
+            yield dumps({"type": "page", **page}) + b"\n"
+    except Exception as e:
+        failed = True
+        print(f"Error extracting page {done + 1} of document {document_id}: {e}")
+        yield dumps({"type": "error", "page": done + 1, "error": str(e)}) + b"\n"
+    finally:
+        if done:
+            write_queue.submit(user_id, write_page_text, document_id)
+        else:
+            write_queue.submit(user_id, delete_page_document, document_id)
+        if on_close is not None:
+            on_close()
+    yield dumps({
+        "type": "done",
+        "document_id": document_id if done else None,
+        "extracted_pages": done,
+        "ocr_pages": ocr_pages,
+        "complete": not failed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }) + b"\n"
+
 @app.post("/extract-text")
-async def extract_text(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+async def extract_text(file: UploadFile = File(...), stream: bool = False,
+                       current_user: dict = Depends(get_current_user)):
+    """
+    Extract text from a PDF or image. With stream=true the response is NDJSON,
+    one record per page, and each page is stored as soon as it is extracted.
+    """
     try:
         content = await file.read()
+        pages = extract_pages(content, file.filename)
+        if pages is None:
+            return {"error": "Unsupported file format"}
 
-        if file.filename.endswith(".pdf"):
-            pdf_doc = fitz.open(stream=content, filetype="pdf")
-            text = ""
-            for page_num in range(len(pdf_doc)):
-                page = pdf_doc[page_num]
-                text += page.get_text()
-                if not text.strip():  # if no text layer, run OCR
-                    pix = page.get_pixmap()
-                    img_data = pix.tobytes("png")
-                    img = Image.open(io.BytesIO(img_data))
-                    text += pytesseract.image_to_string(img)
-            
-            # Store in database
-            conn = sqlite3.connect('legal_app.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO documents (user_id, original_text) VALUES (?, ?)",
-                (current_user["id"], text)
-            )
-            conn.commit()
-            conn.close()
-            
-            return {"extracted_text": text.strip()}
+        # Waits for an OCR slot, or fails fast with 429
+        ticket = await admission.acquire("ocr", current_user["id"])
+        document_id = None
+        try:
+            document_id = await run_in_threadpool(create_page_document, 'legal_app.db', current_user["id"])
 
-        elif file.filename.endswith((".png", ".jpg", ".jpeg")):
-            image = Image.open(io.BytesIO(content))
-            text = pytesseract.image_to_string(image)
-            
-            # Store in database
-            conn = sqlite3.connect('legal_app.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO documents (user_id, original_text) VALUES (?, ?)",
-                (current_user["id"], text)
-            )
-            conn.commit()
-            conn.close()
-            
-            return {"extracted_text": text.strip()}
+            if stream:
+                # The slot is held until the last page is sent (or the client disconnects)
+                page_count = await run_in_threadpool(count_pages, content, file.filename)
+                return StreamingResponse(
+                    stream_extraction(pages, current_user["id"], document_id, page_count, ticket.release),
+                    media_type="application/x-ndjson",
+                    background=BackgroundTask(ticket.release)
+                )
 
-        return {"error": "Unsupported file format"}
-    
+            def extract_all():
+                texts = []
+                for page in pages:
+                    write_queue.submit(current_user["id"], write_page, document_id, page)
+                    texts.append(page["text"])
+                write_queue.submit(current_user["id"], write_page_text, document_id)
+                return "".join(texts)
+
+            text = await run_in_threadpool(extract_all)
+        except BaseException:
+            ticket.release()
+            if document_id is not None:
+                # Queued after any pages already written, so those go too
+                write_queue.submit(current_user["id"], delete_page_document, document_id)
+            raise
+        ticket.release()
+        return {"extracted_text": text.strip(), "document_id": document_id}
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@app.get("/documents/{document_id}/pages")
+async def get_document_pages(document_id: int, start: int = 1, limit: Optional[int] = None,
+                             current_user: dict = Depends(get_current_user)):
+    """Pages stored so far for an extracted document, including one still being extracted"""
+    await read_your_writes(current_user["id"])
+    conn = sqlite3.connect('legal_app.db')
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM documents WHERE id = ? AND user_id = ?", (document_id, current_user["id"]))
+        if cursor.fetchone() is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        pages = load_pages(cursor, document_id, start, limit)
+    finally:
+        conn.close()
+    return {"document_id": document_id, "pages": pages}
+
 @app.post("/simplify")
-async def simplify(text_data: dict, current_user: dict = Depends(get_current_user)):
+async def simplify(text_data: dict, request: Request, current_user: dict = Depends(get_current_user)):
     try:
         text = text_data.get("text", "")
         level = text_data.get("level", "simple")
+        risk_format = text_data.get("risk_format", "full")
+        fields = requested_fields(request, text_data)
         
         print(f"Simplifying text: {text[:100]}...")
         print(f"Simplification level: {level}")
-        
-        # Identify risks in original text
-        risks = identify_legal_risks(text)
-        print(f"Found {len(risks)} risks in original text")
-        
-        # Simplify text using LLM (with fallback to rule-based)
-        simplified = simplify_with_llm(text, level)
+
+        # Waits for an LLM slot, or fails fast with 429
+        async with await admission.acquire("llm", current_user["id"]):
+            if text_data.get("incremental"):
+                result = await run_in_threadpool(
+                    simplify_incremental, text, level, current_user["id"], text_data.get("document_id"),
+                    risk_format
+                )
+                return encode_response(result, request, fields)
+
+            # Identify risks in original text (segmented once, shared by all stages)
+            doc = parse_document(text)
+            risks = detect_risk_spans(doc)
+            print(f"Found {len(risks)} risks in original text")
+
+            # Simplify text using LLM (with fallback to rule-based), reusing stored
+            # simplifications of near-identical clauses
+            simplified, clause_reuse = await run_in_threadpool(simplify_with_clause_reuse, doc, level)
         print(f"Simplified text: {simplified[:100]}...")
         
         # Identify risks in simplified text
-        simplified_risks = identify_legal_risks(simplified)
+        simplified_risks = detect_risk_spans(simplified)
         print(f"Found {len(simplified_risks)} risks in simplified text")
         
-        # Add color annotations to both texts
-        annotated_original = add_color_annotations(text, risks)
-        annotated_simplified = add_color_annotations(simplified, simplified_risks)
+        # Add color annotations to both texts (skipped when the client didn't ask for them)
+        annotated_original = add_color_annotations(text, risks) if wants(fields, "annotated_original") else None
+        annotated_simplified = (add_color_annotations(simplified, simplified_risks)
+                                if wants(fields, "annotated_simplified") else None)
         
-        # Update database with simplified text
+        # Update database with both texts and the risk index (original risk offsets refer to this text)
         try:
-            conn = sqlite3.connect('legal_app.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE documents SET simplified_text = ? WHERE user_id = ? ORDER BY id DESC LIMIT 1",
-                (simplified, current_user["id"])
+            await run_in_threadpool(
+                persist_results, current_user["id"], {"original_text": text, "simplified_text": simplified},
+                {"original": risks, "simplified": simplified_risks}, text_data.get("document_id")
             )
-            conn.commit()
-            conn.close()
         except Exception as db_error:
             print(f"Database update error (non-critical): {db_error}")
         
-        return {
+        return encode_response({
             "original_text": text,
             "simplified_text": simplified,
-            "original_risks": risks,
-            "simplified_risks": simplified_risks,
+            "original_risks": format_risks(risks, risk_format) if wants(fields, "original_risks") else None,
+            "simplified_risks": (format_risks(simplified_risks, risk_format)
+                                 if wants(fields, "simplified_risks") else None),
             "annotated_original": annotated_original,
             "annotated_simplified": annotated_simplified,
+            "clause_reuse": clause_reuse,
             "success": True
-        }
+        }, request, fields)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in simplify endpoint: {str(e)}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error simplifying text: {str(e)}")
 
 @app.post("/translate")
-async def translate(text_data: dict, current_user: dict = Depends(get_current_user)):
+async def translate(text_data: dict, request: Request, current_user: dict = Depends(get_current_user)):
+    fields = requested_fields(request, text_data)
     try:
         text = text_data.get("text", "")
         target_lang = text_data.get("language", "hindi")
+        risk_format = text_data.get("risk_format", "full")
         
         print(f"Translating text: {text[:100]}...")
         print(f"Target language: {target_lang}")
-        
-        # Use the enhanced translation function
-        translated = get_translation(text, target_lang)
+
+        # Waits for a translation slot, or fails fast with 429
+        async with await admission.acquire("translation", current_user["id"]):
+            if text_data.get("incremental"):
+                result = await run_in_threadpool(
+                    translate_incremental, text, target_lang, current_user["id"], text_data.get("document_id"),
+                    risk_format
+                )
+                return encode_response(result, request, fields)
+
+            # Risks are found once in the English source; the translation is made
+            # sentence by sentence so each source risk maps onto its sentence's
+            # translation (the English patterns don't match translated text)
+            doc = parse_document(text)
+            source_risks = detect_risk_spans(doc)
+            alignment = await run_in_threadpool(translate_with_alignment, doc, target_lang)
+        translated = alignment.text
         
         print(f"Final translated text: {translated[:100]}...")
         
-        # Identify risks in translated text
-        risks = identify_legal_risks(translated)
-        print(f"Found {len(risks)} risks in translated text")
+        risks = project_risks(source_risks, alignment, translation_glossary(target_lang))
+        print(f"Projected {len(risks)} of {len(source_risks)} source risks onto the translation")
         
-        # Update database with translated text
+        # Update database with translated text and the risk index
         try:
-            conn = sqlite3.connect('legal_app.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE documents SET translated_text = ? WHERE user_id = ? ORDER BY id DESC LIMIT 1",
-                (translated, current_user["id"])
+            await run_in_threadpool(
+                persist_results, current_user["id"], {"translated_text": translated},
+                {"translated": risks}, text_data.get("document_id")
             )
-            conn.commit()
-            conn.close()
         except Exception as db_error:
             print(f"Database update error (non-critical): {db_error}")
         
-        return {
+        return encode_response({
             "original_text": text,
             "translated_text": translated,
-            "risks": risks,
+            "risks": format_risks(risks, risk_format) if wants(fields, "risks") else None,
+            "alignment": alignment.segments() if wants(fields, "alignment") else None,
             "success": True,
             "translation_service": "ai4bharat" if not translated.startswith('[') else "fallback"
-        }
+        }, request, fields)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in translate endpoint: {str(e)}")
         traceback.print_exc()
         # Return mock translation even on complete failure
         fallback_translation = get_mock_translation(text_data.get("text", ""), text_data.get("language", "hindi"))
-        return {
+        return encode_response({
             "original_text": text_data.get("text", ""),
             "translated_text": fallback_translation,
             "risks": [],
             "success": False,
             "error": str(e),
             "translation_service": "fallback"
-        }
+        }, request, fields)
 @app.get("/check-translation-api")
 async def check_translation_api():
-    """Check the status of translation APIs"""
-    test_text = "Hello world"
-    
-    # Test different endpoints
-    endpoints = [
-        "https://api.ai4bharat.org/translate",
-        "https://models.ai4bharat.org/translate/a2b",
-        "https://translate.ai4bharat.org/translate"
-    ]
-    
-    results = {}
-    
-    for endpoint in endpoints:
+    """Read-only view of the background endpoint health table"""
+    return {
+        "api_check": translation_prober.snapshot(),
+        "selected_endpoint": translation_prober.best_endpoint(),
+        "probe_interval": translation_prober.interval
+    }
+
+def worker_counters() -> Dict:
+    """This worker's counters, published to the shared state and summed across workers by /stats"""
+    budget = getattr(simplification_backend, "budget", None)
+    return {
+        "token_budget": dict(budget.stats) if budget else {},
+        "clause_index": {k: v for k, v in clause_index.stats.items() if k != "clauses"},
+        "admission": {
+            name: {**stage.stats, "active": stage.active, "queue_depth": len(stage.waiters)}
+            for name, stage in admission.stages.items()
+        },
+        "single_flight": {flight.name: dict(flight.stats) for flight in (llm_flight, translation_flight)},
+        "result_cache": dict(result_cache_stats),
+        "write_behind": {k: write_queue.stats[k] for k in ("writes", "batches", "failed")},
+    }
+
+metrics_publisher = MetricsPublisher(shared_state, worker_counters)
+
+@app.get("/stats")
+async def service_stats():
+    """
+    Counters for the LLM generation budget, clause reuse, admission control
+    and request coalescing in this worker, plus totals over all live workers
+    """
+    backend = get_simplification_backend()
+    budget = getattr(backend, "budget", None)
+    metrics_publisher.publish()
+    workers = shared_state.load_metrics()
+    return {
+        "worker_id": shared_state.worker_id,
+        "simplification_backend": backend.name,
+        "token_budget": budget.snapshot() if budget else None,
+        "clause_index": clause_index.snapshot(),
+        "admission": admission.snapshot(),
+        "single_flight": {
+            flight.name: {**flight.stats, "in_flight": flight.in_flight()}
+            for flight in (llm_flight, translation_flight)
+        },
+        "result_cache": dict(result_cache_stats),
+        "write_behind": write_queue.snapshot(),
+        "workers": {
+            "count": len(workers),
+            "ids": sorted(workers),
+            "totals": sum_metrics(workers.values()),
+        }
+    }
+
+# Request profiles (admin only)
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+@app.get("/admin/profiles")
+async def list_profiles(admin: dict = Depends(get_admin_user)):
+    """Recent request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, admin: dict = Depends(get_admin_user)):
+    """Collapsed stacks of one profile, for flamegraph.pl or speedscope"""
+    if profile_store.get(profile_id) is None or not os.path.exists(profile_store.path(profile_id)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(profile_store.path(profile_id), media_type="text/plain",
+                        filename=f"profile-{profile_id}.folded")
+
+# Batch processing
+batch_stages = StageLimiter(STAGE_LIMITS, admission)
+BATCH_OPERATION_STAGES = {"simplify": "llm", "translate": "translation"}
+batch_jobs = BatchJobStore(shared_state)
+
+def load_batch_documents(user_id: int, document_ids: List[int]) -> List[Dict]:
+    """Fetch the user's stored documents for a batch, in request order"""
+    if not document_ids:
+        return []
+    write_queue.sync(user_id)
+    conn = sqlite3.connect('legal_app.db')
+    cursor = conn.cursor()
+    placeholders = ",".join("?" * len(document_ids))
+    cursor.execute(
+        f"SELECT id, original_text FROM documents WHERE user_id = ? AND id IN ({placeholders})",
+        (user_id, *document_ids)
+    )
+    found = {row[0]: row[1] for row in cursor.fetchall()}
+    conn.close()
+
+    missing = [doc_id for doc_id in document_ids if doc_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documents not found: {missing}")
+    return [{"document_id": doc_id, "text": found[doc_id] or ""} for doc_id in document_ids]
+
+def save_batch_results(user_id: int, items: List[Dict], results: List[Dict]):
+    """Persist a whole batch in a single transaction"""
+    conn = sqlite3.connect('legal_app.db')
+    cursor = conn.cursor()
+    try:
+        for item, result in zip(items, results):
+            if not result or not result.get("success"):
+                continue
+            if item.get("document_id"):
+                cursor.execute(
+                    "UPDATE documents SET simplified_text = COALESCE(?, simplified_text), "
+                    "translated_text = COALESCE(?, translated_text) WHERE id = ? AND user_id = ?",
+                    (result.get("simplified_text"), result.get("translated_text"),
+                     item["document_id"], user_id)
+                )
+            else:
+                cursor.execute(
+                    "INSERT INTO documents (user_id, original_text, simplified_text, translated_text) "
+                    "VALUES (?, ?, ?, ?)",
+                    (user_id, item["text"], result.get("simplified_text"), result.get("translated_text"))
+                )
+                result["document_id"] = cursor.lastrowid
+            for source, spans in item.get("risk_spans", {}).items():
+                store_risks(cursor, result["document_id"], user_id, source, spans)
+        conn.commit()
+    except Exception as db_error:
+        print(f"Database batch write error (non-critical): {db_error}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+def make_batch_processor(batch: BatchRequest, user_id: int):
+    async def process(item: Dict) -> Dict:
+        text = item["text"]
+        result = {}
+        item["risk_spans"] = {}
+        if item.get("document_id"):
+            result["document_id"] = item["document_id"]
+
+        if "simplify" in batch.operations:
+            doc = parse_document(text)  # segmented once for risk detection and clause reuse
+            risks = await batch_stages.run("risk", user_id, detect_risk_spans, doc)
+            item["risk_spans"]["original"] = risks
+            result["original_risks"] = format_risks(risks, batch.risk_format)
+            simplified, _ = await batch_stages.run("llm", user_id, simplify_with_clause_reuse, doc, batch.level)
+            result["simplified_text"] = simplified
+            risks = await batch_stages.run("risk", user_id, detect_risk_spans, simplified)
+            item["risk_spans"]["simplified"] = risks
+            result["simplified_risks"] = format_risks(risks, batch.risk_format)
+
+        if "translate" in batch.operations:
+            source = result.get("simplified_text", text)
+            source_risks = item["risk_spans"].get("simplified")
+            if source_risks is None:
+                source_risks = await batch_stages.run("risk", user_id, detect_risk_spans, source)
+            alignment = await batch_stages.run("translation", user_id, translate_with_alignment, source, batch.language)
+            translated = alignment.text
+            result["translated_text"] = translated
+            risks = project_risks(source_risks, alignment, translation_glossary(batch.language))
+            item["risk_spans"]["translated"] = risks
+            result["translated_risks"] = format_risks(risks, batch.risk_format)
+            result["translation_service"] = "ai4bharat" if not translated.startswith('[') else "fallback"
+
+        return result
+    return process
+
+async def run_and_save_batch(job: Dict, items: List[Dict], batch: BatchRequest):
+    await run_batch(job, items, make_batch_processor(batch, job["user_id"]), batch_jobs.progress)
+    await run_in_threadpool(save_batch_results, job["user_id"], items, job["results"])
+    await run_in_threadpool(batch_jobs.finish, job)
+
+def batch_job_view(job: Dict) -> Dict:
+    return {key: value for key, value in job.items() if key != "user_id"}
+
+@app.post("/batch")
+async def batch_process(batch: BatchRequest, background_tasks: BackgroundTasks,
+                        current_user: dict = Depends(get_current_user)):
+    """Simplify and/or translate many documents in one request"""
+    unknown = set(batch.operations) - {"simplify", "translate"}
+    if unknown or not batch.operations:
+        raise HTTPException(status_code=400, detail=f"Unsupported operations: {sorted(unknown)}")
+
+    items = [{"text": doc.text, "ref": doc.ref} if doc.ref is not None else {"text": doc.text}
+             for doc in batch.documents]
+    items += await run_in_threadpool(load_batch_documents, current_user["id"], batch.document_ids)
+    if not items:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} documents)")
+
+    # One admission token per document and stage, taken up front
+    admission.charge([BATCH_OPERATION_STAGES[op] for op in batch.operations], current_user["id"], len(items))
+    job = batch_jobs.create(current_user["id"], len(items))
+    if batch.background:
+        background_tasks.add_task(run_and_save_batch, job, items, batch)
+        return {"job_id": job["job_id"], "status": job["status"], "total": job["total"]}
+
+    await run_and_save_batch(job, items, batch)
+    return batch_job_view(job)
+
+@app.get("/batch/{job_id}")
+async def get_batch_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = batch_jobs.get(job_id, current_user["id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return batch_job_view(job)
+
+@app.get("/search")
+async def search(q: str, limit: int = 20, offset: int = 0, current_user: dict = Depends(get_current_user)):
+    """Full-text search over the user's original, simplified and translated documents"""
+    limit = max(1, min(limit, 100))
+    started = time.perf_counter()
+    await read_your_writes(current_user["id"])
+
+    def run_search():
+        conn = sqlite3.connect('legal_app.db')
         try:
-            global AI4BHARAT_TRANSLATION_API
-            AI4BHARAT_TRANSLATION_API = endpoint
-            
-            response = requests.post(
-                endpoint,
-                json={"text": test_text, "source": "en", "target": "hi"},
-                headers={"Content-Type": "application/json"},
-                timeout=10
-            )
-            
-            results[endpoint] = {
-                "status": response.status_code,
-                "headers": dict(response.headers),
-                "response": response.text[:200] if response.text else "No response body"
-            }
-            
-        except Exception as e:
-            results[endpoint] = {"error": str(e)}
-    
-    return {"api_check": results, "test_text": test_text}
+            return search_documents(conn, current_user["id"], q, limit, max(offset, 0))
+        finally:
+            conn.close()
+
+    try:
+        results = await run_in_threadpool(run_search)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+    return {
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+@app.get("/documents/risk-summary")
+async def documents_by_risk(category: str, min_count: int = 1, max_count: Optional[int] = None,
+                            source: str = "original", limit: int = 100,
+                            current_user: dict = Depends(get_current_user)):
+    """Documents with a given number of risk spans in a category, served from the summary index"""
+    if category not in RISK_CATEGORIES or source not in RISK_SOURCES:
+        raise HTTPException(status_code=400, detail="Unknown risk category or source")
+    await read_your_writes(current_user["id"])
+
+    def run_query():
+        conn = sqlite3.connect('legal_app.db')
+        try:
+            return find_documents_by_risk(conn.cursor(), current_user["id"], category, source,
+                                          min_count, max_count, max(1, min(limit, 1000)))
+        finally:
+            conn.close()
+
+    documents = await run_in_threadpool(run_query)
+    return {"category": category, "source": source, "documents": documents, "count": len(documents)}
+
+@app.get("/documents/{document_id}/risks")
+async def document_risks(document_id: int, source: Optional[str] = None, include_spans: bool = True,
+                         risk_format: str = "full", current_user: dict = Depends(get_current_user)):
+    """Stored risk summary and spans for a document, without re-scanning its text"""
+    if source is not None and source not in RISK_SOURCES:
+        raise HTTPException(status_code=400, detail="Unknown risk source")
+    await read_your_writes(current_user["id"])
+
+    def load():
+        conn = sqlite3.connect('legal_app.db')
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM documents WHERE id = ? AND user_id = ?", (document_id, current_user["id"]))
+            if cursor.fetchone() is None:
+                return None
+            summary = load_risk_summary(cursor, document_id, source)
+            if include_spans:
+                for row_source, entry in summary.items():
+                    spans = load_risk_spans(cursor, document_id, row_source, RISK_CATEGORY_ORDER)
+                    if risk_format != "compact":
+                        cursor.execute(f"SELECT {row_source}_text FROM documents WHERE id = ?", (document_id,))
+                        spans.text = cursor.fetchone()[0] or ""
+                    entry["risks"] = format_risks(spans, risk_format)
+            return summary
+        finally:
+            conn.close()
+
+    summary = await run_in_threadpool(load)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return encode_response({"document_id": document_id, "sources": summary, "success": True})
+
 @app.get("/languages")
 async def get_supported_languages():
     """Get list of supported languages for translation"""
@@ -956,5 +1688,6 @@ async def get_supported_languages():
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Multi-process serving and its options live in serve.py
+    from serve import main
+    main()
@@ -0,0 +1,105 @@
+# Backend/page_extraction.py
+# Page-by-page text extraction with incremental persistence of each page.
+import io
+import sqlite3
+from typing import Callable, Dict, Iterator, List, Optional
+
+PAGE_SOURCES = ("text", "ocr")
+
+
+def init_page_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_pages (
+        document_id INTEGER NOT NULL,
+        page_number INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        text TEXT NOT NULL,
+        PRIMARY KEY (document_id, page_number),
+        FOREIGN KEY (document_id) REFERENCES documents (id)
+    )
+    ''')
+
+
+def iter_pdf_pages(content: bytes, ocr: Callable) -> Iterator[Dict]:
+    """
+    Yield {"page", "source", "text"} per page as soon as it is extracted.
+    Each page is checked on its own, so a scanned page after a page with a
+    text layer is still OCR'd.
+    """
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    pdf_doc = fitz.open(stream=content, filetype="pdf")
+    try:
+        for page_num in range(len(pdf_doc)):
+            page = pdf_doc[page_num]
+            text = page.get_text()
+            source = "text"
+            if not text.strip():  # no text layer, run OCR
+                img = Image.open(io.BytesIO(page.get_pixmap().tobytes("png")))
+                text = ocr(img)
+                source = "ocr"
+            yield {"page": page_num + 1, "source": source, "text": text}
+    finally:
+        pdf_doc.close()
+
+
+def iter_image_pages(content: bytes, ocr: Callable) -> Iterator[Dict]:
+    from PIL import Image
+
+    yield {"page": 1, "source": "ocr", "text": ocr(Image.open(io.BytesIO(content)))}
+
+
+def count_pages(content: bytes, filename: str) -> int:
+    if filename.endswith(".pdf"):
+        import fitz  # PyMuPDF
+
+        with fitz.open(stream=content, filetype="pdf") as pdf_doc:
+            return len(pdf_doc)
+    return 1
+
+
+def create_page_document(db_path: str, user_id: int) -> int:
+    """Insert the document row up front so pages can reference it"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO documents (user_id, original_text) VALUES (?, ?)", (user_id, ""))
+    document_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return document_id
+
+
+def write_page(cursor, document_id: int, page: Dict):
+    cursor.execute(
+        "INSERT OR REPLACE INTO document_pages (document_id, page_number, source, text) VALUES (?, ?, ?, ?)",
+        (document_id, page["page"], page["source"], page["text"])
+    )
+
+
+def write_page_text(cursor, document_id: int) -> str:
+    """
+    Join the stored pages into documents.original_text (one update, one
+    re-index), stripped like the text /extract-text returns
+    """
+    cursor.execute(
+        "SELECT text FROM document_pages WHERE document_id = ? ORDER BY page_number", (document_id,)
+    )
+    text = "".join(row[0] for row in cursor.fetchall()).strip()
+    cursor.execute("UPDATE documents SET original_text = ? WHERE id = ?", (text, document_id))
+    return text
+
+
+def delete_page_document(cursor, document_id: int):
+    """Remove a document whose extraction failed before any page was stored"""
+    cursor.execute("DELETE FROM document_pages WHERE document_id = ?", (document_id,))
+    cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+
+def load_pages(cursor, document_id: int, start: int = 1, limit: Optional[int] = None) -> List[Dict]:
+    cursor.execute(
+        "SELECT page_number, source, text FROM document_pages "
+        "WHERE document_id = ? AND page_number >= ? ORDER BY page_number LIMIT ?",
+        (document_id, start, -1 if limit is None else limit)
+    )
+    return [{"page": page, "source": source, "text": text} for page, source, text in cursor.fetchall()]
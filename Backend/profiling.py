@@ -0,0 +1,216 @@
+# Backend/profiling.py
+# Opt-in sampling profiler for individual requests, saved as collapsed stacks.
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# Fraction of requests to PROFILE_PATHS profiled at random, for background collection
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = ("/simplify", "/translate", "/extract-text", "/batch")
+
+# Leaf frames of threads that are parked rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("base_events.py", "_run_once"),
+}
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread except its own at a fixed interval
+    from a background thread. Covers the event loop and threadpool workers,
+    so work a request hands to run_in_threadpool is included. Other requests
+    running at the same time show up too.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        deadline = self.started + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.perf_counter() > deadline:
+                break
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format, read by flamegraph.pl and speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """
+    Collapsed-stack files in PROFILE_DIR, each with a JSON metadata file
+    beside it, newest kept. Everything is on disk, so any worker process can
+    list and serve profiles taken by the others.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+
+    def path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.folded")
+
+    def meta_path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile_id: str, profiler: SamplingProfiler, method: str, path: str,
+             status: Optional[int], trigger: str) -> Dict:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(profile_id), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+        meta = {
+            "profile_id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "trigger": trigger,
+            "duration_ms": round(profiler.elapsed * 1000, 1),
+            "samples": profiler.samples,
+            "interval_ms": profiler.interval * 1000,
+            "created_at": time.time(),
+        }
+        # Written after the stacks and renamed into place, so readers never see a partial profile
+        temp_path = self.meta_path(profile_id) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.meta_path(profile_id))
+        for old in self.list()[self.keep:]:
+            for old_path in (self.meta_path(old["profile_id"]), self.path(old["profile_id"])):
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return meta
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(self.meta_path(profile_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self) -> List[Dict]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        profiles = [self.get(name[:-len(".json")]) for name in names if name.endswith(".json")]
+        return sorted((meta for meta in profiles if meta), key=lambda m: m["created_at"], reverse=True)
+
+
+def _flagged(scope) -> bool:
+    query = scope.get("query_string", b"")
+    if b"profile" in query and parse_qs(query.decode("latin-1")).get("profile") == ["1"]:
+        return True
+    for name, value in scope["headers"]:
+        if name == b"x-profile" and value == b"1":
+            return True
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware: a request is profiled when it carries X-Profile: 1
+    (or ?profile=1) and is_admin accepts its headers, or when it is picked
+    by PROFILE_SAMPLE_RATE. The profile covers the whole response, streamed
+    bodies included, and its id is returned in X-Profile-Id. Requests that
+    are not profiled pass straight through.
+    """
+
+    def __init__(self, app, store: ProfileStore, is_admin: Callable[[Dict[str, str]], bool],
+                 sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.store = store
+        self.is_admin = is_admin
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = None
+        if _flagged(scope):
+            headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+            if self.is_admin(headers):
+                trigger = "request"
+        elif self.sample_rate and scope["path"] in PROFILE_PATHS and random.random() < self.sample_rate:
+            trigger = "sampled"
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:16]
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("ascii"))
+                ])
+            await send(message)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            meta = self.store.save(profile_id, profiler, scope["method"], scope["path"], status, trigger)
+            print(f"Profiled {scope['method']} {scope['path']}: {meta['samples']} samples, "
+                  f"{meta['duration_ms']} ms -> {self.store.path(meta['profile_id'])}")
@@ -0,0 +1,98 @@
+# Backend/response_encoding.py
+# Field selection, fast JSON encoding and compression for large responses.
+import gzip
+import json
+import os
+from typing import Dict, Iterable, Optional, Set, Union
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_THRESHOLD = int(os.getenv("COMPRESSION_THRESHOLD", "4096"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Always returned, whatever fields were requested
+ALWAYS_INCLUDED = {"success", "error"}
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Optional[Set[str]]:
+    """Accept 'a,b' or ['a', 'b']; None means all fields"""
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return {field.strip() for field in fields if field.strip()}
+
+
+def requested_fields(request: Request, body: Optional[Dict] = None) -> Optional[Set[str]]:
+    """Fields from the request body, falling back to the ?fields= query parameter"""
+    if body and body.get("fields"):
+        return parse_fields(body["fields"])
+    return parse_fields(request.query_params.get("fields"))
+
+
+def wants(fields: Optional[Set[str]], name: str) -> bool:
+    return fields is None or name in fields
+
+
+def select_fields(payload: Dict, fields: Optional[Set[str]]) -> Dict:
+    if fields is None:
+        return payload
+    return {key: value for key, value in payload.items() if key in fields or key in ALWAYS_INCLUDED}
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encode_response(payload: Dict, request: Optional[Request] = None,
+                    fields: Optional[Set[str]] = None, status_code: int = 200) -> Response:
+    """Serialize payload with the fast encoder and compress it when worthwhile"""
+    body = dumps(select_fields(payload, fields))
+    headers = {"Vary": "Accept-Encoding"}
+    if request is not None and len(body) >= COMPRESSION_THRESHOLD:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
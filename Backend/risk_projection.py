@@ -0,0 +1,195 @@
+# Backend/risk_projection.py
+# Project risks found in the English source onto its translation through the
+# sentence alignment kept from translating one line of text per output line.
+import os
+import re
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from document_model import ParsedDocument
+from glossary import Glossary
+from risk_spans import RiskSpans
+
+# Longest text sent to the translator in one call; longer documents go in a few
+# chunks, one after another, so a document holds a single translation slot
+CHUNK_CHARS = int(os.getenv("TRANSLATION_CHUNK_CHARS", "4000"))
+
+LINE_CONTENT = re.compile(r'\S(?:[^\n]*\S)?')  # one line's text without its surrounding whitespace
+
+
+class Alignment:
+    """Source sentence i was translated to text[starts[i]:ends[i]] (empty for blank sentences)"""
+    __slots__ = ("source", "text", "starts", "ends")
+
+    def __init__(self, source: ParsedDocument, text: str, starts: array, ends: array):
+        self.source = source
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+
+    def segments(self) -> List[Dict]:
+        return [
+            {"source": [source_start, source_end], "target": [target_start, target_end]}
+            for source_start, source_end, target_start, target_end
+            in zip(self.source.starts, self.source.ends, self.starts, self.ends)
+        ]
+
+
+def _chunks(lines: List[str], chunk_chars: int) -> List[List[int]]:
+    """Indexes of consecutive lines grouped into chunks of at most chunk_chars (one line at least)"""
+    chunks: List[List[int]] = []
+    size = 0
+    for i, line in enumerate(lines):
+        if not chunks or (size + len(line) > chunk_chars and chunks[-1]):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(i)
+        size += len(line) + 1
+    return chunks
+
+
+def _snap(text: str, position: int, low: int) -> int:
+    """The space nearest to position, not before low"""
+    position = max(position, low)
+    spaces = [p for p in (text.rfind(" ", low, position + 1), text.find(" ", position)) if p >= low]
+    return min(spaces, key=lambda p: abs(p - position)) if spaces else position
+
+
+def split_lines(output: str, sources: List[str]) -> List[str]:
+    """
+    The translation of each source line. When the translator merged or
+    split lines, the output is cut in proportion to the source lengths
+    instead, at the nearest spaces.
+    """
+    lines = [line.strip() for line in output.split("\n") if line.strip()]
+    if len(lines) == len(sources):
+        return lines
+    text = " ".join(lines)
+    total = sum(len(source) for source in sources) or 1
+    cuts = [0]
+    consumed = 0
+    for source in sources[:-1]:
+        consumed += len(source)
+        cuts.append(_snap(text, round(len(text) * consumed / total), cuts[-1]))
+    cuts.append(len(text))
+    return [text[start:end].strip() for start, end in zip(cuts, cuts[1:])]
+
+
+def translate_aligned(doc: ParsedDocument, translate: Callable[[str], str], chunk_chars: int = CHUNK_CHARS,
+                      fallback_prefix: Optional[str] = None) -> Alignment:
+    """
+    Translate the document one line of text per line, in as few calls as
+    chunk_chars allows (one for most documents); the line breaks are the
+    markers that tell which output belongs to which line. Whitespace and
+    line breaks of the source are kept between the translated lines, and
+    the offsets of each sentence's translation are recorded.
+    fallback_prefix is the marker the fallback translation puts before each
+    call's output; it is kept on the first line only.
+    """
+    text = doc.text
+    pieces = [(match.start(), match.end()) for start, end in doc.spans()
+              for match in LINE_CONTENT.finditer(text, start, end)]
+    lines = [" ".join(text[start:end].split()) for start, end in pieces]
+    translated: List[str] = []
+    for chunk in _chunks(lines, chunk_chars):
+        sources = [lines[i] for i in chunk]
+        translated.extend(split_lines(translate("\n".join(sources)) or "", sources))
+
+    marker = fallback_prefix.strip() if fallback_prefix else ""
+    for i in range(1, len(translated)):
+        if marker and translated[i].startswith(marker):
+            translated[i] = translated[i][len(marker):].lstrip()
+
+    parts: List[str] = []
+    starts = array("q")
+    ends = array("q")
+    position = 0
+    copied = 0  # source offset up to which the text has been carried over
+    piece = 0
+    for sentence_start, sentence_end in doc.spans():
+        starts.append(position + sentence_start - copied)
+        while piece < len(pieces) and pieces[piece][1] <= sentence_end:
+            start, end = pieces[piece]
+            parts.append(text[copied:start])
+            parts.append(translated[piece])
+            position += start - copied + len(translated[piece])
+            copied = end
+            piece += 1
+        ends.append(position + sentence_end - copied)
+    parts.append(text[copied:])
+    return Alignment(doc, "".join(parts), starts, ends)
+
+
+def _candidates(term: str, glossary: Optional[Glossary]) -> List[str]:
+    """Strings that may stand for a matched source term in the translation, most specific first"""
+    term = term.lower()
+    words = sorted(term.split(), key=len, reverse=True)
+    candidates = []
+    if glossary is not None:
+        candidates.extend(glossary.terms[t] for t in [term] + words if t in glossary.terms)
+    candidates.append(term)  # untranslated text (fallbacks keep English words)
+    return candidates
+
+
+def _find(text: str, candidate: str, start: int = 0) -> int:
+    """str.find, but English candidates must match whole words ("if" not in "notified")"""
+    found = text.find(candidate, start)
+    if candidate.isascii():
+        while found != -1 and (
+                (found > 0 and text[found - 1].isalnum())
+                or (found + len(candidate) < len(text) and text[found + len(candidate)].isalnum())):
+            found = text.find(candidate, found + 1)
+    return found
+
+
+def project_segment(source: str, target: str, spans: List[Tuple[int, int, int, float]],
+                    glossary: Optional[Glossary]) -> List[Tuple[int, int, int, float]]:
+    """
+    Map one sentence's spans (segment-local offsets) onto its translation.
+    A span is anchored on its glossary translation, or the source term
+    itself, where that occurs in the translated segment. When no span of
+    the sentence can be anchored, the whole segment is marked once with the
+    most confident span's category, so highlights never overlap.
+    """
+    if not spans or not target.strip():
+        return []
+    lowered = target.lower()
+    if len(lowered) != len(target):  # lowercasing changed offsets (rare Unicode cases)
+        lowered = target
+    taken: List[Tuple[int, int]] = []
+    projected = []
+    for start, end, category_id, confidence in spans:
+        for candidate in _candidates(source[start:end], glossary):
+            found = _find(lowered, candidate)
+            while found != -1 and any(found < e and found + len(candidate) > s for s, e in taken):
+                found = _find(lowered, candidate, found + 1)
+            if found != -1:
+                taken.append((found, found + len(candidate)))
+                projected.append((found, found + len(candidate), category_id, confidence))
+                break
+    if not projected:
+        start, end, category_id, confidence = max(spans, key=lambda span: (span[3], -span[0]))
+        stripped = target.rstrip()
+        leading = len(stripped) - len(stripped.lstrip())
+        return [(leading, len(stripped), category_id, confidence)]
+    return sorted(projected)
+
+
+def project_risks(spans: RiskSpans, alignment: Alignment, glossary: Optional[Glossary]) -> RiskSpans:
+    """Risk spans of the source document carried over to the aligned translation"""
+    doc = alignment.source
+    by_sentence: Dict[int, List[Tuple[int, int, int, float]]] = {}
+    for start, end, category_id, confidence in zip(spans.starts, spans.ends, spans.category_ids,
+                                                    spans.confidences):
+        sentence = doc.sentence_at(start)
+        offset = doc.starts[sentence]
+        by_sentence.setdefault(sentence, []).append((start - offset, end - offset, category_id, confidence))
+
+    projected = RiskSpans(alignment.text, spans.categories)
+    for sentence in sorted(by_sentence):
+        target_start = alignment.starts[sentence]
+        target = alignment.text[target_start:alignment.ends[sentence]]
+        for start, end, category_id, confidence in project_segment(
+                doc.sentence(sentence), target, by_sentence[sentence], glossary):
+            projected.append(target_start + start, target_start + end, category_id, confidence)
+    return projected
@@ -0,0 +1,130 @@
+# Backend/risk_scoring.py
+# Deterministic, vectorized confidence scores for detected risk spans.
+import re
+from array import array
+from typing import Dict, List, Optional
+
+from document_model import ParsedDocument
+from risk_spans import RiskSpans
+
+# Matched against lowercased text: case-sensitive scanning is much faster
+NEGATION_WORDS = re.compile(r"(?<![a-z])(?:not|no|never|neither|nor|without|cannot)(?![a-z])")
+NEGATION_WORDS_ANY_CASE = re.compile(r"\b(?:not|no|never|neither|nor|without|cannot)\b", re.IGNORECASE)
+
+# How strongly each pattern on its own indicates its category
+DEFAULT_PATTERN_WEIGHTS = {
+    r"shall\b": 0.85, r"must\b": 0.9, r"is required to\b": 0.9, r"are obligated to\b": 0.92, r"duty to\b": 0.8,
+    r"penalty\b": 0.9, r"fine\b": 0.6, r"damages\b": 0.85, r"liable\b": 0.88, r"indemnify\b": 0.92,
+    r"breach\b": 0.8,
+    r"if\b": 0.7, r"unless\b": 0.85, r"provided that\b": 0.9, r"subject to\b": 0.8, r"conditional upon\b": 0.92,
+    r"may\b": 0.65, r"entitled to\b": 0.9, r"right\b": 0.6, r"option\b": 0.7, r"privilege\b": 0.75,
+    r"means\b": 0.85, r"refers to\b": 0.8, r"defined as\b": 0.92, r"hereinafter\b": 0.88,
+    r"for the purposes of\b": 0.8,
+}
+DEFAULT_PATTERN_WEIGHT = 0.75
+
+# Adjustments added to the pattern weight
+DEFAULT_FEATURE_WEIGHTS = {
+    "negation": -0.15,   # a negation word shortly before or right after the span
+    "condition": -0.08,  # a condition span (if, unless, ...) shortly before the span
+    "position": 0.08,    # spans early in their sentence (main clause) score higher
+    "density": 0.1,      # spans among other legal terms score higher
+}
+CONTEXT_WINDOW = 40  # characters before the span searched for negations and conditions
+NEGATION_AFTER = 12  # characters after the span searched for negation ("shall not", "may not")
+DENSITY_WINDOW = 80  # characters either side counted for term density
+DENSITY_SATURATION = 4  # neighbouring spans at which the density feature is maxed out
+MIN_SCORE = 0.05
+MAX_SCORE = 0.99
+
+np = None
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+class RiskScorer:
+    """
+    Scores all spans of a text in one batch of array operations. Features
+    are computed inside each span's sentence only, so a sentence gets the
+    same scores whether it is scored alone (incremental mode) or as part of
+    a whole document, and identical input always gives identical scores.
+    """
+
+    def __init__(self, patterns: List[str], pattern_weights: Optional[Dict[str, float]] = None,
+                 feature_weights: Optional[Dict[str, float]] = None):
+        weights = dict(DEFAULT_PATTERN_WEIGHTS, **(pattern_weights or {}))
+        self.pattern_weights = array("d", (weights.get(p, DEFAULT_PATTERN_WEIGHT) for p in patterns))
+        self.feature_weights = dict(DEFAULT_FEATURE_WEIGHTS, **(feature_weights or {}))
+
+    def score(self, spans: RiskSpans, doc: ParsedDocument, pattern_ids: array, sentence_ids: array,
+              condition_category: Optional[int] = None):
+        """
+        Fill spans.confidences; pattern_ids and sentence_ids are parallel to
+        the spans. Spans of condition_category double as the condition words.
+        """
+        if not len(spans):
+            return
+        np = _numpy()
+        text = doc.text
+        w = self.feature_weights
+
+        starts = np.frombuffer(spans.starts, dtype=np.int64)
+        ends = np.frombuffer(spans.ends, dtype=np.int64)
+        sentence = np.frombuffer(sentence_ids, dtype=np.int64)
+        sentence_starts = np.frombuffer(doc.starts, dtype=np.int64)[sentence]
+        sentence_ends = np.frombuffer(doc.ends, dtype=np.int64)[sentence]
+
+        prior = np.frombuffer(self.pattern_weights, dtype=np.float64)[np.frombuffer(pattern_ids, dtype=np.uint16)]
+
+        # Negation words and condition spans around each span, within its sentence
+        window_start = np.maximum(starts - CONTEXT_WINDOW, sentence_starts)
+        negation = self._occurs(self._negations(text), window_start,
+                                np.minimum(ends + NEGATION_AFTER, sentence_ends))
+        if condition_category is None:
+            condition = np.zeros(len(starts))
+        else:
+            categories = np.frombuffer(spans.category_ids, dtype=np.uint8)
+            conditions = np.sort(starts[categories == condition_category])
+            condition = self._occurs(conditions, window_start, starts)
+
+        # Relative position in the sentence: 0 at its start, 1 at its end
+        length = np.maximum(sentence_ends - sentence_starts, 1)
+        position = (starts - sentence_starts) / length
+
+        # Other spans starting nearby in the same sentence
+        sorted_starts = np.sort(starts)
+        low = np.searchsorted(sorted_starts, np.maximum(starts - DENSITY_WINDOW, sentence_starts), "left")
+        high = np.searchsorted(sorted_starts, np.minimum(ends + DENSITY_WINDOW, sentence_ends), "left")
+        density = np.minimum((high - low - 1) / DENSITY_SATURATION, 1.0)
+
+        scores = (prior
+                  + w["negation"] * negation
+                  + w["condition"] * condition
+                  + w["position"] * (0.5 - position)
+                  + w["density"] * (density - 0.5))
+        scores = np.round(np.clip(scores, MIN_SCORE, MAX_SCORE), 2)
+        spans.confidences = array("d")
+        spans.confidences.frombytes(scores.tobytes())
+
+    @staticmethod
+    def _negations(text: str):
+        lowered = text.lower()
+        pattern = NEGATION_WORDS
+        if len(lowered) != len(text):  # lowercasing changed offsets (rare Unicode cases)
+            lowered, pattern = text, NEGATION_WORDS_ANY_CASE
+        return np.fromiter((m.start() for m in pattern.finditer(lowered)), dtype=np.int64)
+
+    @staticmethod
+    def _occurs(positions, window_start, window_end):
+        """1.0 where one of the sorted positions falls inside [window_start, window_end)"""
+        if not len(positions):
+            return np.zeros(len(window_start))
+        counts = (np.searchsorted(positions, window_end, "left")
+                  - np.searchsorted(positions, window_start, "left"))
+        return (counts > 0).astype(np.float64)
@@ -0,0 +1,72 @@
+# Backend/risk_spans.py
+# Array-backed risk span container with dict and compact columnar output.
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+
+class RiskSpans:
+    """
+    Risk spans for one text stored as parallel arrays. Category labels,
+    colors and classes are kept once in a legend instead of being repeated
+    on every span.
+    """
+    __slots__ = ("text", "categories", "starts", "ends", "category_ids", "confidences")
+
+    def __init__(self, text: str, categories: List[str]):
+        self.text = text
+        self.categories = list(categories)
+        self.starts = array("q")
+        self.ends = array("q")
+        self.category_ids = array("B")
+        self.confidences = array("d")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(self, start: int, end: int, category_id: int, confidence: float):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.category_ids.append(category_id)
+        self.confidences.append(confidence)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str, float]]:
+        categories = self.categories
+        for start, end, category_id, confidence in zip(self.starts, self.ends,
+                                                       self.category_ids, self.confidences):
+            yield start, end, categories[category_id], confidence
+
+    @classmethod
+    def from_dicts(cls, text: str, risks: List[Dict], categories: List[str]) -> "RiskSpans":
+        spans = cls(text, categories)
+        index = {category: i for i, category in enumerate(spans.categories)}
+        for risk in risks:
+            spans.append(risk["start"], risk["end"], index[risk["category"]], risk.get("confidence", 0.8))
+        return spans
+
+    def to_dicts(self, category_info: Dict[str, Dict]) -> List[Dict]:
+        """Legacy one-dict-per-span representation"""
+        text = self.text
+        return [
+            {
+                "text": text[start:end],
+                "start": start,
+                "end": end,
+                "category": category,
+                "label": category_info[category]["label"],
+                "color": category_info[category]["color"],
+                "class": category_info[category]["class"],
+                "confidence": confidence,
+            }
+            for start, end, category, confidence in self
+        ]
+
+    def to_compact(self, category_info: Dict[str, Dict]) -> Dict:
+        """Columnar representation: parallel arrays plus a single category legend"""
+        return {
+            "format": "compact",
+            "legend": [dict(category_info[category], category=category) for category in self.categories],
+            "start": self.starts.tolist(),
+            "end": self.ends.tolist(),
+            "category": self.category_ids.tolist(),
+            "confidence": self.confidences.tolist(),
+        }
@@ -0,0 +1,110 @@
+# Backend/risk_store.py
+# Persisted per-document risk spans and precomputed per-category summaries.
+from collections import Counter
+from typing import Dict, List, Optional
+
+from risk_spans import RiskSpans
+
+RISK_SOURCES = ("original", "simplified", "translated")
+
+
+def init_risk_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_risks (
+        document_id INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        category TEXT NOT NULL,
+        start_offset INTEGER NOT NULL,
+        end_offset INTEGER NOT NULL,
+        confidence REAL,
+        FOREIGN KEY (document_id) REFERENCES documents (id)
+    )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_document_risks_doc ON document_risks (document_id, source, start_offset)"
+    )
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_risk_summary (
+        document_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        category TEXT NOT NULL,
+        span_count INTEGER NOT NULL,
+        density REAL NOT NULL,
+        text_length INTEGER NOT NULL,
+        PRIMARY KEY (document_id, source, category),
+        FOREIGN KEY (document_id) REFERENCES documents (id)
+    )
+    ''')
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_risk_summary_lookup "
+        "ON document_risk_summary (user_id, source, category, span_count)"
+    )
+
+
+def store_risks(cursor, document_id: int, user_id: int, source: str, spans: RiskSpans,
+                text_length: Optional[int] = None):
+    """Replace the stored spans and summary rows for one text of a document"""
+    if text_length is None:
+        text_length = len(spans.text)
+    cursor.execute("DELETE FROM document_risks WHERE document_id = ? AND source = ?", (document_id, source))
+    cursor.executemany(
+        "INSERT INTO document_risks (document_id, source, category, start_offset, end_offset, confidence) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(document_id, source, category, start, end, confidence) for start, end, category, confidence in spans]
+    )
+
+    counts = Counter(spans.category_ids)
+    cursor.executemany(
+        "INSERT OR REPLACE INTO document_risk_summary "
+        "(document_id, user_id, source, category, span_count, density, text_length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (document_id, user_id, source, category, counts.get(category_id, 0),
+             round(counts.get(category_id, 0) * 1000 / text_length, 4) if text_length else 0.0, text_length)
+            for category_id, category in enumerate(spans.categories)
+        ]
+    )
+
+
+def load_risk_summary(cursor, document_id: int, source: Optional[str] = None) -> Dict[str, Dict]:
+    """{source: {"text_length": n, "total": n, "categories": {category: {count, density}}}}"""
+    cursor.execute(
+        "SELECT source, category, span_count, density, text_length FROM document_risk_summary "
+        "WHERE document_id = ? AND (? IS NULL OR source = ?)",
+        (document_id, source, source)
+    )
+    summary: Dict[str, Dict] = {}
+    for row_source, category, span_count, density, text_length in cursor.fetchall():
+        entry = summary.setdefault(row_source, {"text_length": text_length, "total": 0, "categories": {}})
+        entry["categories"][category] = {"count": span_count, "density": density}
+        entry["total"] += span_count
+    return summary
+
+
+def load_risk_spans(cursor, document_id: int, source: str, categories: List[str]) -> RiskSpans:
+    cursor.execute(
+        "SELECT start_offset, end_offset, category, confidence FROM document_risks "
+        "WHERE document_id = ? AND source = ? ORDER BY start_offset",
+        (document_id, source)
+    )
+    spans = RiskSpans("", categories)
+    index = {category: i for i, category in enumerate(spans.categories)}
+    for start, end, category, confidence in cursor:
+        spans.append(start, end, index[category], confidence)
+    return spans
+
+
+def find_documents_by_risk(cursor, user_id: int, category: str, source: str = "original",
+                           min_count: int = 1, max_count: Optional[int] = None,
+                           limit: int = 100) -> List[Dict]:
+    """Documents whose span count for a category falls in a range (index lookup)"""
+    cursor.execute(
+        "SELECT document_id, span_count, density FROM document_risk_summary "
+        "WHERE user_id = ? AND source = ? AND category = ? AND span_count >= ? "
+        "AND (? IS NULL OR span_count <= ?) ORDER BY span_count DESC LIMIT ?",
+        (user_id, source, category, min_count, max_count, max_count, limit)
+    )
+    return [
+        {"document_id": document_id, "count": span_count, "density": density}
+        for document_id, span_count, density in cursor.fetchall()
+    ]
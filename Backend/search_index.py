@@ -0,0 +1,102 @@
+# Backend/search_index.py
+# SQLite FTS5 full-text index over stored documents.
+import re
+import sqlite3
+from typing import Dict, List
+
+SNIPPET_TOKENS = 16
+SEARCH_COLUMNS = ["original_text", "simplified_text", "translated_text"]
+
+
+def init_search_index(cursor):
+    """
+    Create the FTS5 index and the triggers that keep it in sync with the
+    documents table. The owner column holds a per-user token so filtering by
+    user happens inside the index instead of after ranking every match.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_fts'")
+    existed = cursor.fetchone() is not None
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_user ON documents (user_id, id)")
+    cursor.execute('''
+    CREATE VIEW IF NOT EXISTS documents_search_source AS
+    SELECT id, original_text, simplified_text, translated_text, 'u' || user_id AS owner
+    FROM documents
+    ''')
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+        original_text, simplified_text, translated_text, owner,
+        content='documents_search_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts (rowid, original_text, simplified_text, translated_text, owner)
+        VALUES (new.id, new.original_text, new.simplified_text, new.translated_text, 'u' || new.user_id);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, original_text, simplified_text, translated_text, owner)
+        VALUES ('delete', old.id, old.original_text, old.simplified_text, old.translated_text, 'u' || old.user_id);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_update
+    AFTER UPDATE OF original_text, simplified_text, translated_text, user_id ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, original_text, simplified_text, translated_text, owner)
+        VALUES ('delete', old.id, old.original_text, old.simplified_text, old.translated_text, 'u' || old.user_id);
+        INSERT INTO documents_fts (rowid, original_text, simplified_text, translated_text, owner)
+        VALUES (new.id, new.original_text, new.simplified_text, new.translated_text, 'u' || new.user_id);
+    END
+    ''')
+
+    # Index documents stored before the search index existed
+    if not existed:
+        cursor.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+
+
+def to_match_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word must appear, a trailing
+    * keeps prefix matching, and FTS5 operators in user input are neutralised.
+    """
+    terms = []
+    for word, prefix in re.findall(r'(\w+)(\*?)', query):
+        terms.append(f'"{word}"' + prefix)
+    return " ".join(terms)
+
+
+def search_documents(conn: sqlite3.Connection, user_id: int, query: str,
+                     limit: int = 20, offset: int = 0) -> List[Dict]:
+    """Ranked matches for the user's documents with highlighted snippets"""
+    match = to_match_query(query)
+    if not match:
+        return []
+
+    snippets = ", ".join(
+        f"snippet(documents_fts, {column}, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})"
+        for column in range(len(SEARCH_COLUMNS))
+    )
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT d.id, d.created_at, bm25(documents_fts, 1.0, 1.0, 1.0, 0.0) AS score, {snippets} "
+        "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+        "WHERE documents_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?",
+        (f'owner : "u{int(user_id)}" AND ({match})', limit, offset)
+    )
+
+    results = []
+    for row in cursor:
+        results.append({
+            "document_id": row[0],
+            "created_at": row[1],
+            "score": round(-row[2], 4),
+            "snippets": {
+                column: snippet
+                for column, snippet in zip(SEARCH_COLUMNS, row[3:])
+                if snippet and "<mark>" in snippet
+            },
+        })
+    return results
@@ -0,0 +1,41 @@
+# Backend/serve.py
+# Multi-process serving entry point, e.g.:
+#   python serve.py --workers 4
+#   WEB_CONCURRENCY=4 python serve.py --port 8000
+# Each worker is a separate process with its own event loop and threadpool, so
+# CPU-bound stages (OCR, risk detection, local models) use one core per worker.
+# Caches, counters, endpoint health and batch jobs are shared through
+# shared_state.py and profiles through PROFILE_DIR; admission limits
+# (admission.py) apply per worker.
+import argparse
+import os
+
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the legal document simplifier API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    import uvicorn
+    from main import init_db, shared_state
+
+    # Create tables once before any worker starts; workers repeat it under the
+    # shared lock, which is then a no-op
+    with shared_state.exclusive():
+        init_db()
+
+    print(f"Starting {args.workers} worker(s) on {args.host}:{args.port}")
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
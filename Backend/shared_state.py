@@ -0,0 +1,246 @@
+# Backend/shared_state.py
+# State shared between worker processes through a small SQLite database:
+# result cache, per-worker metrics, leases, the endpoint health table and
+# batch jobs.
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", "shared_state.db")
+CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))  # seconds
+METRICS_INTERVAL = 5  # seconds between publishing this worker's counters
+METRICS_MAX_AGE = 30  # seconds after which a silent worker is left out of totals
+PRUNE_INTERVAL = 60  # seconds between deleting expired cache entries and jobs
+
+
+class SharedState:
+    """
+    One connection per thread to a WAL-mode SQLite file. Every operation is
+    a single short statement, so workers never hold locks across requests.
+    """
+
+    def __init__(self, path: str = SHARED_STATE_DB):
+        self.path = path
+        self.worker_id = os.getpid()
+        self._local = threading.local()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            self._create_tables(conn)
+        return conn
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at);
+        CREATE TABLE IF NOT EXISTS worker_metrics (
+            worker_id INTEGER PRIMARY KEY,
+            metrics TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS endpoint_health (
+            endpoint TEXT PRIMARY KEY,
+            entry TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS batch_jobs (
+            job_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            job TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        ''')
+        self._initialized = True
+
+    # Coordination
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Cross-process mutex: holds the shared database's write lock, so e.g.
+        workers starting together run idempotent initialization one at a time
+        """
+        conn = sqlite3.connect(self.path, timeout=300, isolation_level=None)
+        try:
+            if not self._initialized:
+                self._create_tables(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def try_lease(self, name: str, ttl: float) -> bool:
+        """Take or renew a named lease; True while this worker holds it"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+            "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+            (name, self.worker_id, now + ttl, now)
+        )
+        row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == self.worker_id
+
+    def release_lease(self, name: str):
+        self._conn().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, self.worker_id))
+
+    # Result cache
+
+    def cache_get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_set(self, key: str, value: Any, ttl: float = CACHE_TTL):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl)
+        )
+
+    def cache_prune(self) -> int:
+        return self._conn().execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    # Batch jobs
+
+    def save_job(self, job: Dict, ttl: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO batch_jobs (job_id, user_id, job, expires_at) VALUES (?, ?, ?, ?)",
+            (job["job_id"], job["user_id"], json.dumps(job), time.time() + ttl)
+        )
+
+    def load_job(self, job_id: str, user_id: int) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT job FROM batch_jobs WHERE job_id = ? AND user_id = ? AND expires_at > ?",
+            (job_id, user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def jobs_prune(self) -> int:
+        return self._conn().execute("DELETE FROM batch_jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def prune(self):
+        """Delete expired cache entries and batch jobs"""
+        try:
+            removed = self.cache_prune() + self.jobs_prune()
+            if removed:
+                print(f"Pruned {removed} expired shared-state rows")
+        except sqlite3.Error as e:
+            print(f"Error pruning shared state: {e}")
+
+    # Metrics
+
+    def publish_metrics(self, metrics: Dict):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO worker_metrics (worker_id, metrics, updated_at) VALUES (?, ?, ?)",
+            (self.worker_id, json.dumps(metrics), time.time())
+        )
+
+    def load_metrics(self, max_age: float = METRICS_MAX_AGE) -> Dict[int, Dict]:
+        rows = self._conn().execute(
+            "SELECT worker_id, metrics FROM worker_metrics WHERE updated_at > ?", (time.time() - max_age,)
+        )
+        return {worker_id: json.loads(metrics) for worker_id, metrics in rows}
+
+    def remove_metrics(self):
+        self._conn().execute("DELETE FROM worker_metrics WHERE worker_id = ?", (self.worker_id,))
+
+    # Endpoint health
+
+    def publish_health(self, table: Dict[str, Dict]):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO endpoint_health (endpoint, entry, updated_at) VALUES (?, ?, ?)",
+            [(endpoint, json.dumps(entry), now) for endpoint, entry in table.items()]
+        )
+        conn.execute("COMMIT")
+
+    def load_health(self) -> Dict[str, Dict]:
+        rows = self._conn().execute("SELECT endpoint, entry FROM endpoint_health")
+        return {endpoint: json.loads(entry) for endpoint, entry in rows}
+
+
+def sum_metrics(snapshots) -> Dict:
+    """Add up numeric leaves of several workers' metrics; other values are dropped"""
+    total: Dict = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                total[key] = round(total.get(key, 0) + value, 4)
+            elif isinstance(value, dict):
+                total[key] = sum_metrics([total.get(key, {}), value])
+    return total
+
+
+class MetricsPublisher:
+    """
+    Background thread writing this worker's counters to the shared state.
+    It also prunes expired shared rows every prune_interval seconds.
+    """
+
+    def __init__(self, shared: SharedState, collect: Callable[[], Dict], interval: float = METRICS_INTERVAL,
+                 prune_interval: float = PRUNE_INTERVAL):
+        self.shared = shared
+        self.collect = collect
+        self.interval = interval
+        self.prune_interval = prune_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self):
+        try:
+            self.shared.publish_metrics(self.collect())
+        except Exception as e:
+            print(f"Error publishing worker metrics: {e}")
+
+    def _run(self):
+        next_prune = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self.publish()
+            if time.monotonic() >= next_prune:
+                self.shared.prune()
+                next_prune = time.monotonic() + self.prune_interval
+
+    def start(self):
+        self.publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+        try:
+            self.shared.remove_metrics()
+        except Exception as e:
+            print(f"Error removing worker metrics: {e}")
@@ -0,0 +1,253 @@
+# Backend/simplification_backends.py
+# Pluggable simplification backends: remote Hugging Face API or a local CPU model.
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from document_model import parse_document
+from token_budget import TokenBudget
+
+LOCAL_MODEL_DIR = os.getenv("LOCAL_SIMPLIFIER_MODEL", "")
+LOCAL_MAX_BATCH_SIZE = int(os.getenv("LOCAL_SIMPLIFIER_MAX_BATCH", "16"))
+LOCAL_MAX_WAIT_MS = float(os.getenv("LOCAL_SIMPLIFIER_MAX_WAIT_MS", "10"))
+LOCAL_THREADS = int(os.getenv("LOCAL_SIMPLIFIER_THREADS", "0"))  # 0 lets the runtime decide
+
+# Instruction prefix per simplification level for the local model
+LOCAL_LEVEL_PROMPTS = {
+    "simple": "Simplify in plain words: ",
+    "moderate": "Simplify: ",
+    "advanced": "Rephrase more clearly: ",
+}
+
+
+class SimplificationBackend:
+    """
+    Interface for simplification backends. simplify() returns the simplified
+    text, or None when the backend could not produce one so the caller can
+    fall back to the rule-based simplifier.
+    """
+    name = "base"
+
+    @property
+    def model(self) -> str:
+        return self.name
+
+    def simplify(self, text: str, level: str = "simple") -> Optional[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HuggingFaceBackend(SimplificationBackend):
+    """Mistral-7B through the Hugging Face Inference API"""
+    name = "huggingface"
+
+    def __init__(self, api_url: str, api_token: str, timeout: float = 90):
+        self.api_url = api_url
+        self.api_token = api_token
+        # Upper bound; each call gets a timeout sized to its expected output
+        self.timeout = timeout
+        self.budget = TokenBudget(timeout)
+
+    @property
+    def model(self) -> str:
+        return self.api_url
+
+    def simplify(self, text: str, level: str = "simple") -> Optional[str]:
+        import requests
+
+        # Truncate very long text to avoid API limits
+        if len(text) > 4000:
+            text = text[:4000] + "... [text truncated]"
+
+        prompt = f"""
+        You are a legal expert specializing in simplifying complex legal documents for non-lawyers.
+
+        Please simplify the following legal text to make it easy for a layperson to understand.
+        Keep the meaning exactly the same but use plain language.
+        Break down complex sentences and replace legal jargon with everyday words.
+
+        Legal text to simplify:
+        {text}
+
+        Simplified version:
+        """
+
+        plan = self.budget.plan(text, level)
+
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json"
+        }
+
+        payload = {
+            "inputs": prompt,
+            "parameters": {
+                "max_new_tokens": plan["max_new_tokens"],
+                "temperature": 0.3,
+                "do_sample": True,
+                "return_full_text": False
+            }
+        }
+
+        started = time.perf_counter()
+        try:
+            response = requests.post(
+                self.api_url,
+                headers=headers,
+                json=payload,
+                timeout=plan["timeout"]
+            )
+        except requests.Timeout:
+            self.budget.record_timeout(plan)
+            raise
+
+        if response.status_code != 200:
+            print(f"LLM API error: {response.status_code} - {response.text}")
+            return None
+
+        result = response.json()
+        simplified_text = result[0]['generated_text'].strip()
+
+        # Clean up the response
+        simplified_text = re.sub(r'^Simplified version:\s*', '', simplified_text)
+        simplified_text = re.sub(r'\n+', '\n', simplified_text).strip()
+
+        self.budget.record(level, plan, simplified_text, time.perf_counter() - started)
+        return simplified_text
+
+
+class DynamicBatcher:
+    """
+    Groups items submitted from many threads into batches. A batch is sent to
+    process_batch as soon as it holds max_batch_size items or the oldest item
+    has waited max_wait_ms, whichever comes first.
+    """
+
+    def __init__(self, process_batch: Callable[[List], List], max_batch_size: int = LOCAL_MAX_BATCH_SIZE,
+                 max_wait_ms: float = LOCAL_MAX_WAIT_MS):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"batches": 0, "items": 0, "max_batch": 0}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="dynamic-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items: List) -> List:
+        """Submit all items and wait for their results, in order"""
+        return [future.result() for future in [self.submit(item) for item in items]]
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return batch
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+            if batch[-1] is None:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stopping = batch[-1] is None
+            batch = [entry for entry in batch if entry is not None]
+            if batch:
+                items = [item for item, _ in batch]
+                try:
+                    results = self.process_batch(items)
+                    for (_, future), result in zip(batch, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in batch:
+                        future.set_exception(e)
+                self.stats["batches"] += 1
+                self.stats["items"] += len(batch)
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            if stopping:
+                return
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class LocalSeq2SeqBackend(SimplificationBackend):
+    """
+    Small seq2seq model (e.g. flan-t5-small) on local CPU through CTranslate2.
+    Convert a model once with:
+
+        ct2-transformers-converter --model google/flan-t5-small \\
+            --output_dir models/flan-t5-small-ct2 --quantization int8 --copy_files tokenizer.json
+
+    Sentences from all concurrent requests are grouped into dynamic batches.
+
+    A tokenizer and translator may be passed in instead of a model directory
+    (anything with the same methods), so the backend and its batching can be
+    run offline without a converted model.
+    """
+    name = "local"
+
+    def __init__(self, model_dir: str = LOCAL_MODEL_DIR, max_batch_size: int = LOCAL_MAX_BATCH_SIZE,
+                 max_wait_ms: float = LOCAL_MAX_WAIT_MS, threads: int = LOCAL_THREADS,
+                 tokenizer=None, translator=None):
+        if tokenizer is None or translator is None:
+            if not model_dir:
+                raise ValueError("LOCAL_SIMPLIFIER_MODEL is not set")
+            if tokenizer is None:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model_dir)
+            if translator is None:
+                import ctranslate2
+                translator = ctranslate2.Translator(model_dir, device="cpu", compute_type="int8",
+                                                    intra_threads=threads)
+        self.model_dir = model_dir or "custom"
+        self.tokenizer = tokenizer
+        self.translator = translator
+        self.max_batch_size = max_batch_size
+        self.batcher = DynamicBatcher(self._generate_batch, max_batch_size, max_wait_ms)
+
+    @property
+    def model(self) -> str:
+        return f"local:{os.path.basename(os.path.normpath(self.model_dir))}"
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        tokenizer = self.tokenizer
+        source = [tokenizer.convert_ids_to_tokens(tokenizer.encode(prompt)) for prompt in prompts]
+        results = self.translator.translate_batch(
+            source, max_batch_size=self.max_batch_size, beam_size=1, max_decoding_length=256
+        )
+        return [
+            tokenizer.decode(tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+            for result in results
+        ]
+
+    def simplify(self, text: str, level: str = "simple") -> Optional[str]:
+        sentences = [sentence for sentence in parse_document(text).sentences() if sentence.strip()]
+        if not sentences:
+            return text
+        instruction = LOCAL_LEVEL_PROMPTS.get(level, LOCAL_LEVEL_PROMPTS["simple"])
+        prompts = [instruction + sentence for sentence in sentences]
+        return " ".join(part.strip() for part in self.batcher.map(prompts))
+
+    def close(self):
+        self.batcher.close()
+
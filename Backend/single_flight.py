@@ -0,0 +1,66 @@
+# Backend/single_flight.py
+# Coalesce concurrent identical upstream calls into one in-flight call.
+import hashlib
+import threading
+from typing import Any, Callable, Dict
+
+
+def flight_key(text: str, *parts: str) -> str:
+    """Stable key from the text hash and the parameters that change the result"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return ":".join([digest, *parts])
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    While a call for a key is running, later callers with the same key wait
+    for it and share its result instead of starting their own.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = {"calls": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, func: Callable, *args) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats["calls"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
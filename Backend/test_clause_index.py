@@ -0,0 +1,41 @@
+# Backend/test_clause_index.py
+# Regression checks for clause reuse across documents: python -m pytest test_clause_index.py
+import sqlite3
+
+from clause_index import ClauseIndex, init_clause_table
+
+CLAUSE = ("{party} shall pay the monthly service fee for the hosted platform to the provider on the first "
+          "business day of each calendar month, together with any applicable taxes, by bank transfer to the "
+          "account that the provider designates in writing, and late payments accrue interest at the rate "
+          "stated in the order form.")
+
+
+def make_index(tmp_path) -> ClauseIndex:
+    db_path = str(tmp_path / "clauses.db")
+    conn = sqlite3.connect(db_path)
+    init_clause_table(conn.cursor())
+    conn.commit()
+    conn.close()
+    return ClauseIndex(db_path)
+
+
+def test_single_word_party_is_not_reused_for_another_party(tmp_path):
+    index = make_index(tmp_path)
+    index.add(CLAUSE.format(party="Acme"), "Acme must pay the monthly fee on the first business day.", "simple")
+
+    assert index.lookup(CLAUSE.format(party="Globex"), "simple") is None
+    assert index.lookup(CLAUSE.format(party="Acme"), "simple") is not None
+
+
+def test_reordered_multi_clause_output_is_not_indexed(tmp_path):
+    index = make_index(tmp_path)
+    clauses = [CLAUSE.format(party="The customer"),
+               "Either party may terminate this agreement by giving sixty days written notice to the other "
+               "party, and termination does not affect any rights or obligations that accrued before it."]
+    in_order = ("The customer must pay the monthly service fee with taxes on the first business day. "
+                "Either party can terminate this agreement with sixty days written notice.")
+    reordered = ("Either party can terminate this agreement with sixty days written notice. "
+                 "The customer must pay the monthly service fee with taxes on the first business day.")
+
+    assert index.add_aligned(clauses, reordered, "simple") == 0
+    assert index.add_aligned(clauses, in_order, "simple") == 2
@@ -0,0 +1,94 @@
+# Backend/token_budget.py
+# Input-length-aware generation budget and timeout for LLM calls.
+import math
+import threading
+from typing import Dict
+
+CHARS_PER_TOKEN = 4.0  # rough figure for English text with a Llama/Mistral tokenizer
+TOKENS_PER_WORD = 1.3
+
+# Expected output tokens per input token, by simplification level. These are
+# starting points; record() keeps them tuned to what the model actually returns.
+LEVEL_RATIOS = {"simple": 1.2, "moderate": 1.0, "advanced": 0.9}
+DEFAULT_RATIO = 1.2
+
+HEADROOM = 1.5  # generate up to this multiple of the expected output
+MIN_NEW_TOKENS = 64
+MAX_NEW_TOKENS = 1024
+
+SECONDS_PER_TOKEN = 0.04  # initial guess at generation speed
+BASE_LATENCY = 3.0  # queueing and prompt processing, seconds
+TIMEOUT_SAFETY = 1.5
+MIN_TIMEOUT = 8.0
+
+SMOOTHING = 0.1  # weight of each new observation in the moving averages
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(1, math.ceil(max(len(text) / CHARS_PER_TOKEN, len(text.split()) * TOKENS_PER_WORD)))
+
+
+class TokenBudget:
+    """
+    Plans max_new_tokens and the request timeout from the input size and
+    level, and learns output/input ratios and generation speed from the
+    outputs it is shown.
+    """
+
+    def __init__(self, max_timeout: float, max_new_tokens: int = MAX_NEW_TOKENS):
+        self.max_timeout = max_timeout
+        self.max_new_tokens = max_new_tokens
+        self.ratios = dict(LEVEL_RATIOS)
+        self.seconds_per_token = SECONDS_PER_TOKEN
+        self.stats = {"requests": 0, "truncated": 0, "timeouts": 0}
+        self._lock = threading.Lock()
+
+    def plan(self, text: str, level: str = "simple") -> Dict:
+        input_tokens = estimate_tokens(text)
+        with self._lock:
+            ratio = self.ratios.get(level, DEFAULT_RATIO)
+            seconds_per_token = self.seconds_per_token
+        expected = input_tokens * ratio
+        max_new_tokens = int(min(max(math.ceil(expected * HEADROOM), MIN_NEW_TOKENS), self.max_new_tokens))
+        timeout = BASE_LATENCY + max_new_tokens * seconds_per_token * TIMEOUT_SAFETY
+        return {
+            "input_tokens": input_tokens,
+            "max_new_tokens": max_new_tokens,
+            "timeout": round(min(max(timeout, MIN_TIMEOUT), self.max_timeout), 1),
+        }
+
+    def record(self, level: str, plan: Dict, output: str, elapsed: float):
+        """Feed back the actual output length and latency of a completed call"""
+        output_tokens = estimate_tokens(output)
+        with self._lock:
+            self.stats["requests"] += 1
+            if output_tokens >= plan["max_new_tokens"] * 0.95:
+                # Output was probably cut off: treat it as longer than observed
+                self.stats["truncated"] += 1
+                output_tokens = int(output_tokens * HEADROOM)
+            if plan["input_tokens"]:
+                ratio = output_tokens / plan["input_tokens"]
+                current = self.ratios.get(level, DEFAULT_RATIO)
+                self.ratios[level] = round((1 - SMOOTHING) * current + SMOOTHING * ratio, 4)
+            if output_tokens:
+                speed = max(elapsed - BASE_LATENCY, 0.0) / output_tokens
+                self.seconds_per_token = round(
+                    (1 - SMOOTHING) * self.seconds_per_token + SMOOTHING * speed, 5
+                )
+
+    def record_timeout(self, plan: Dict):
+        """A timeout means generation is slower than assumed"""
+        with self._lock:
+            self.stats["timeouts"] += 1
+            self.seconds_per_token = round(self.seconds_per_token * (1 + SMOOTHING), 5)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "ratios": dict(self.ratios),
+                "seconds_per_token": self.seconds_per_token,
+                "max_timeout": self.max_timeout,
+                **self.stats,
+            }
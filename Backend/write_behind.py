@@ -0,0 +1,198 @@
+# Backend/write_behind.py
+# Write-behind persistence: result writes from many requests are queued and
+# committed together, one transaction per batch, by a single writer thread.
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# Set WRITE_BEHIND=0 to write synchronously inside the request, as before
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "1") == "1"
+FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "20"))  # longest a write waits for company
+MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))  # writes per transaction
+COMMIT_RETRIES = 3
+# Longest a read waits for its user's queued writes before going ahead without them
+SYNC_TIMEOUT = float(os.getenv("WRITE_BEHIND_SYNC_TIMEOUT", "10"))  # seconds
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Jobs are func(cursor, *args) and run in submission order. A batch is
+    committed once MAX_BATCH jobs are queued or FLUSH_INTERVAL_MS after its
+    first job, so many requests share one fsync. Each job runs under its own
+    savepoint: a failing job is rolled back and logged without losing the
+    rest of the batch.
+
+    sync(user_id) waits until the user's queued writes are committed, which
+    gives read-your-writes to the reads that call it; after SYNC_TIMEOUT it
+    gives up and the read may miss those writes. A batch that fails as a
+    whole is counted in stats["failed"] and skipped. close() flushes
+    everything still queued; it runs on shutdown and at interpreter exit.
+    A hard kill loses at most the writes of the current flush interval.
+    Queues are per process, so with several workers a read on another
+    worker can trail a write by up to one flush interval.
+    """
+
+    def __init__(self, db_path: str, flush_interval_ms: float = FLUSH_INTERVAL_MS, max_batch: int = MAX_BATCH,
+                 enabled: bool = WRITE_BEHIND):
+        self.db_path = db_path
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.stats = {"writes": 0, "batches": 0, "failed": 0, "largest_batch": 0, "commit_ms": 0.0}
+        self._queue: queue.Queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._submitted = 0  # sequence number of the last queued job
+        self._committed = 0  # every job up to this sequence number is committed
+        self._user_seq: Dict[int, int] = {}  # last queued job per user
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, user_id: int, func: Callable, *args):
+        """Queue func(cursor, *args); runs it right away when the queue is not running"""
+        with self._cond:
+            if self._thread is not None:
+                self._submitted += 1
+                self._user_seq[user_id] = self._submitted
+                self._queue.put((self._submitted, func, args))
+                return
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            self._write([(0, func, args)], conn)
+        finally:
+            conn.close()
+
+    def pending(self, user_id: int) -> bool:
+        with self._cond:
+            return self._user_seq.get(user_id, 0) > self._committed
+
+    def sync(self, user_id: int, timeout: Optional[float] = SYNC_TIMEOUT) -> bool:
+        """Block until every write queued for this user is committed; False on timeout"""
+        with self._cond:
+            target = self._user_seq.get(user_id, 0)
+            done = self._cond.wait_for(lambda: self._committed >= target, timeout)
+        if not done:
+            print(f"Write-behind sync for user {user_id} timed out after {timeout}s; reading without queued writes")
+        return done
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every write queued so far is committed"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    def close(self):
+        """Stop accepting jobs and commit everything still queued"""
+        with self._cond:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        print(f"Write-behind queue closed: {self.stats['writes']} writes in {self.stats['batches']} batches, "
+              f"{self.stats['failed']} failed")
+
+    def snapshot(self) -> Dict:
+        with self._cond:
+            return dict(self.stats, queued=self._submitted - self._committed, enabled=self._thread is not None,
+                        flush_interval_ms=self.flush_interval * 1000, max_batch=self.max_batch)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stopping = True  # commit this batch and whatever is left, then stop
+                    continue
+                batch.append(job)
+            try:
+                self._write(batch, self._connect())
+            except Exception as e:
+                # Drop the batch rather than the thread, so later writes and sync() keep working
+                print(f"Write-behind batch of {len(batch)} writes failed: {e}")
+                self._reset_connection()
+                with self._cond:
+                    self.stats["writes"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["failed"] += len(batch)
+            with self._cond:
+                self._committed = batch[-1][0]
+                for user_id in [u for u, seq in self._user_seq.items() if seq <= self._committed]:
+                    del self._user_seq[user_id]
+                self._cond.notify_all()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Opened by the writer thread, closed by close() after the thread has finished
+            self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    def _reset_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _write(self, batch, conn: sqlite3.Connection):
+        """Run the jobs in one transaction, retrying the batch if the commit fails"""
+        started = time.perf_counter()
+        failed = 0
+        for attempt in range(COMMIT_RETRIES):
+            failed = 0
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                for _, func, args in batch:
+                    cursor.execute("SAVEPOINT job")
+                    try:
+                        func(cursor, *args)
+                    except Exception as e:
+                        if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                            raise  # busy past the timeout: retry the whole batch
+                        failed += 1
+                        print(f"Write-behind job {getattr(func, '__name__', func)} failed: {e}")
+                        cursor.execute("ROLLBACK TO job")
+                    cursor.execute("RELEASE job")
+                cursor.execute("COMMIT")
+                break
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                print(f"Write-behind commit failed (attempt {attempt + 1}/{COMMIT_RETRIES}): {e}")
+                failed = len(batch)
+                time.sleep(0.05 * (attempt + 1))
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self.stats["writes"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["failed"] += failed
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            self.stats["commit_ms"] = round(self.stats["commit_ms"] + elapsed, 1)